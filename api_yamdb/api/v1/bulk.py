@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.utils import timezone
+from reviews.models import GenreTitle, Title
+from reviews.versions import bump_version_on_commit, version_label
+
+from .serializers import TitleBulkItemSerializer
+from .taxonomy import get_taxonomy
+
+CREATED = 'created'
+UPDATED = 'updated'
+ERROR = 'error'
+
+UPDATE_FIELDS = ('name', 'year', 'description', 'category', 'modified')
+# Не больше переменных в одном IN, чем допускают старые сборки SQLite.
+QUERY_CHUNK_SIZE = 500
+
+
+def chunked(values, size=QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def title_keys(names):
+    """Словарь (name, year) -> id для произведений с данными названиями."""
+    keys = {}
+    for chunk in chunked(names):
+        for pk, name, year in Title.objects.filter(
+            name__in=chunk
+        ).values_list('id', 'name', 'year'):
+            keys[(name, year)] = pk
+    return keys
+
+
+def validate_items(items, context):
+    """Проверяет поля каждого элемента; slug берутся из кеша справочников."""
+    valid, results = [], []
+    context = dict(context, taxonomy=get_taxonomy())
+    for index, item in enumerate(items):
+        serializer = TitleBulkItemSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+            results.append(None)
+        else:
+            results.append({'status': ERROR, 'errors': serializer.errors})
+    return valid, results
+
+
+def check_uniqueness(valid, results):
+    """Проверяет пары (name, year) и id запросами по всему списку."""
+    existing = title_keys({data['name'] for _, data in valid})
+    known_ids = set()
+    for chunk in chunked({data['id'] for _, data in valid if 'id' in data}):
+        known_ids.update(
+            Title.objects.filter(pk__in=chunk).values_list('id', flat=True)
+        )
+    seen = set()
+    checked = []
+    for index, data in valid:
+        key = (data['name'], data['year'])
+        pk = data.get('id')
+        if pk is not None and pk not in known_ids:
+            error = {'id': ['Произведение не найдено.']}
+        elif key in seen or existing.get(key, pk) != pk:
+            error = {'non_field_errors': [
+                'Произведение, вышедшее в указанном году уже есть в базе'
+            ]}
+        else:
+            seen.add(key)
+            checked.append((index, data))
+            continue
+        results[index] = {'status': ERROR, 'errors': error}
+    return checked
+
+
+@transaction.atomic
+def write_titles(checked, results):
+    """Вставляет и обновляет произведения и их жанры пачками."""
+    now = timezone.now()
+    created = [(index, data) for index, data in checked if 'id' not in data]
+    updated = [(index, data) for index, data in checked if 'id' in data]
+    Title.objects.bulk_create(
+        Title(
+            name=data['name'],
+            year=data['year'],
+            description=data.get('description', ''),
+            category=data['category']
+        )
+        for _, data in created
+    )
+    new_ids = title_keys({data['name'] for _, data in created})
+    Title.objects.bulk_update(
+        [
+            Title(
+                pk=data['id'],
+                name=data['name'],
+                year=data['year'],
+                description=data.get('description', ''),
+                category=data['category'],
+                modified=now
+            )
+            for _, data in updated
+        ],
+        UPDATE_FIELDS
+    )
+    links = []
+    for status, items in ((CREATED, created), (UPDATED, updated)):
+        for index, data in items:
+            pk = data.get('id') or new_ids[(data['name'], data['year'])]
+            results[index] = {'status': status, 'id': pk}
+            links.extend(
+                GenreTitle(title_id=pk, genre_id=genre.pk)
+                for genre in dict.fromkeys(data['genre'])
+            )
+    for chunk in chunked(data['id'] for _, data in updated):
+        GenreTitle.objects.filter(title_id__in=chunk).delete()
+    GenreTitle.objects.bulk_create(links)
+    bump_version_on_commit(
+        Title,
+        GenreTitle,
+        *(version_label(Title, pk=data['id']) for _, data in updated)
+    )
+
+
+def save_titles(items, context):
+    """Создаёт и обновляет произведения списком.
+
+    Элементы с ``id`` обновляются целиком, без него — создаются. Для
+    каждого элемента возвращается статус, id или ошибки; корректные
+    элементы записываются в одной транзакции.
+    """
+    valid, results = validate_items(items, context)
+    checked = check_uniqueness(valid, results)
+    if checked:
+        write_titles(checked, results)
+    return [
+        dict(index=index, **result) for index, result in enumerate(results)
+    ]
@@ -0,0 +1,108 @@
+import csv
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from reviews.models import Comment, Review, Title
+
+from .serializers import (CommentExportSerializer, ReviewExportSerializer,
+                          TitleValuesSerializer)
+from .taxonomy import get_taxonomy
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Модель, сериализатор строк и поле даты для ``since``.
+RESOURCES = {
+    'titles': (Title, TitleValuesSerializer, 'modified'),
+    'reviews': (Review, ReviewExportSerializer, 'pub_date'),
+    'comments': (Comment, CommentExportSerializer, 'pub_date'),
+}
+
+
+class ExportRenderer(BaseRenderer):
+    """Принимает любой Accept: тело выгрузки формирует сам ответ.
+
+    Ошибки, которые DRF всё же рендерит этим классом, отдаются JSON.
+    """
+    media_type = '*/*'
+    format = 'export'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(resource, since=None, chunk_size=2000, flat=False):
+    """Словари строк выгрузки пачками по ``chunk_size``.
+
+    Строки читаются через ``.iterator()``, данные для пачки (жанры
+    произведений) догружаются сериализатором, так что память не зависит
+    от размера таблицы. С ``flat`` связи не раскрываются: жанры
+    и категория отдаются слагами.
+    """
+    model, serializer_class, date_field = RESOURCES[resource]
+    context = {'taxonomy': get_taxonomy()}
+    if flat:
+        context['fields'] = list(serializer_class.columns)
+    serializer = serializer_class(context=context)
+    queryset = model.objects.order_by('id')
+    if since is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    rows = serializer.prepare(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serializer.to_representation(chunk)
+
+
+def csv_value(value):
+    if isinstance(value, (list, tuple)):
+        return ','.join(map(str, value))
+    return '' if value is None else value
+
+
+def render_ndjson(rows, fields):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def render_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([csv_value(row[name]) for name in fields])
+
+
+RENDERERS = {'ndjson': render_ndjson, 'csv': render_csv}
+# Форматы, в ячейках которых нет места вложенным объектам.
+FLAT_FORMATS = ('csv',)
+
+
+def export_response(resource, ext, since=None, chunk_size=2000):
+    """Потоковый ответ с выгрузкой ``resource`` в формате ``ext``."""
+    fields = list(RESOURCES[resource][1].columns)
+    response = StreamingHttpResponse(
+        RENDERERS[ext](
+            export_rows(resource, since, chunk_size, ext in FLAT_FORMATS),
+            fields
+        ),
+        content_type=CONTENT_TYPES[ext]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{resource}.{ext}"'
+    )
+    return response
@@ -1,16 +1,52 @@
+from django.db.models import Count
 from django_filters import rest_framework as filters
 
-from reviews.models import Title
+from reviews.models import GenreTitle, Title
+from reviews.search import search_titles
+
+from .taxonomy import get_taxonomy
+
+CATEGORY_MODES = (
+    ('exact', 'Точное совпадение slug'),
+    ('contains', 'Подстрока slug (устаревший режим)'),
+)
+GENRE_MODES = (
+    ('any', 'Любой из жанров'),
+    ('all', 'Все жанры сразу'),
+    ('contains', 'Подстрока slug (устаревший режим)'),
+)
+
+
+def split_slugs(value):
+    return sorted({slug.strip() for slug in value.split(',') if slug.strip()})
+
+
+def resolve_slugs(table, slugs):
+    """id объектов справочника по slug, без запроса к базе."""
+    return [table.by_slug[slug].pk for slug in slugs if slug in table.by_slug]
 
 
 class TitleFilter(filters.FilterSet):
+    """Фильтры произведений.
+
+    ``category`` и ``genre`` принимают slug или список slug через запятую:
+    они один раз переводятся в id, и дальше фильтрация идёт по
+    ``category_id`` и ``GenreTitle.genre_id``. Поиск подстроки в slug
+    остался в режиме ``*_mode=contains``.
+    """
     category = filters.CharFilter(
-        field_name='category__slug',
-        lookup_expr='icontains'
+        method='filter_category'
+    )
+    category_mode = filters.ChoiceFilter(
+        choices=CATEGORY_MODES,
+        method='filter_mode'
     )
     genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='icontains'
+        method='filter_genre'
+    )
+    genre_mode = filters.ChoiceFilter(
+        choices=GENRE_MODES,
+        method='filter_mode'
     )
     name = filters.CharFilter(
         field_name='name',
@@ -20,12 +56,50 @@ class TitleFilter(filters.FilterSet):
         field_name="year",
         lookup_expr='exact'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Title
         fields = (
             'category',
+            'category_mode',
             'genre',
+            'genre_mode',
             'name',
-            'year'
+            'year',
+            'search'
         )
+
+    def get_mode(self, name, default):
+        return self.form.cleaned_data.get(name) or default
+
+    def filter_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_category(self, queryset, name, value):
+        if self.get_mode('category_mode', 'exact') == 'contains':
+            return queryset.filter(category__slug__icontains=value)
+        ids = resolve_slugs(get_taxonomy().categories, split_slugs(value))
+        return queryset.filter(category_id__in=ids)
+
+    def filter_genre(self, queryset, name, value):
+        mode = self.get_mode('genre_mode', 'any')
+        if mode == 'contains':
+            return queryset.filter(
+                genre__slug__icontains=value
+            ).distinct()
+        slugs = split_slugs(value)
+        ids = resolve_slugs(get_taxonomy().genres, slugs)
+        if not ids or (mode == 'all' and len(ids) < len(slugs)):
+            return queryset.none()
+        links = GenreTitle.objects.filter(genre_id__in=ids).order_by()
+        if mode == 'all' and len(ids) > 1:
+            links = links.values('title_id').annotate(
+                genres=Count('genre_id', distinct=True)
+            ).filter(genres=len(ids))
+        return queryset.filter(id__in=links.values('title_id'))
+
+    def filter_search(self, queryset, name, value):
+        return search_titles(queryset, value)
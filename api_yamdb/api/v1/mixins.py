@@ -1,9 +1,243 @@
-from rest_framework import filters, mixins, viewsets
+import hashlib
+import json
 
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import filters, mixins, permissions, viewsets
+from rest_framework.response import Response
+
+from api_yamdb.timing import timed
+from reviews.versions import get_versions, now_version
+
+from .pagination import get_dependencies, normalized_query
 from .permissions import IsAdminUserOrReadOnly
+from .stats import record_cache
+from .taxonomy import get_taxonomy
+
+
+class TimingMixin:
+    """Фазы запроса для Server-Timing.
+
+    auth, permissions, filter и query (выборка страницы или объекта)
+    замеряются в хуках APIView; serialize — остальное время обработчика,
+    render — отрисовка ответа. Без замера хуки ничего не делают.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        request.timings = getattr(request._request, 'timings', None)
+        super().initial(request, *args, **kwargs)
+        if request.timings is not None:
+            request.timings.start('serialize')
+
+    def perform_authentication(self, request):
+        with timed(request, 'auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timed(request, 'permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed(request, 'permissions'):
+            super().check_object_permissions(request, obj)
+
+    def filter_queryset(self, queryset):
+        with timed(self.request, 'filter'):
+            return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        with timed(self.request, 'query'):
+            return super().paginate_queryset(queryset)
+
+    def get_object(self):
+        with timed(self.request, 'query'):
+            return super().get_object()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        record = getattr(request, 'timings', None)
+        if record is None:
+            return super().finalize_response(
+                request, response, *args, **kwargs
+            )
+        if record.stack and record.stack[-1][0] == 'serialize':
+            record.stop()
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if isinstance(response, Response):
+            with record.phase('render'):
+                response.render()
+        return response
+
+
+class ConditionalGetMixin:
+    """Условные GET запросы по версиям данных.
+
+    Список получает ETag и Last-Modified от версий моделей из
+    ``get_version_labels()``, объект — от своего поля ``modified`` и
+    ``detail_version_labels``. Ответ 304 отдаётся до выборки из базы и
+    сериализации.
+
+    При ``cache_responses`` и настройке ``RESPONSE_CACHE`` готовый JSON
+    списка кешируется по тому же ключу: запись меняет версии только своих
+    меток, поэтому сбрасываются лишь зависящие от неё ответы.
+    """
+    version_labels = None
+    detail_version_labels = ()
+    cache_responses = False
+    response_cache_timeout = 300
+
+    def get_version_labels(self):
+        if self.version_labels is not None:
+            return self.version_labels
+        return get_dependencies(self)
 
+    def get_modified_queryset(self):
+        """Выборка для поиска ``modified`` без подгрузки родителя."""
+        return self.get_queryset()
 
-class MasterViewSet(mixins.CreateModelMixin,
+    def get_object_modified(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.get_modified_queryset().filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values_list('modified', flat=True).first()
+
+    def conditional_response(self, request, state, last_modified, handler,
+                             *args, **kwargs):
+        # В постраничных ответах абсолютные ссылки next и previous.
+        data = json.dumps([
+            request.scheme,
+            request.get_host(),
+            request.path,
+            normalized_query(request, exclude=()),
+            request.accepted_media_type,
+            state,
+        ])
+        self.response_digest = hashlib.md5(data.encode()).hexdigest()
+        etag = quote_etag(self.response_digest)
+        # Версии в миллисекундах, Last-Modified — в секундах: секунда
+        # округляется вверх и не отдаётся, пока не прошла, иначе запись
+        # в ту же секунду получила бы устаревший 304 по If-Modified-Since.
+        last_modified = -(-last_modified // 1000)
+        if last_modified * 1000 > now_version():
+            last_modified = None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        with timed(request, 'cache'):
+            versions = get_versions(*self.get_version_labels())
+        return self.conditional_response(
+            request, versions, max(versions), self.cached_list,
+            *args, **kwargs
+        )
+
+    def cached_list(self, request, *args, **kwargs):
+        renderer_format = request.accepted_renderer.format
+        if (
+            not (self.cache_responses and settings.RESPONSE_CACHE)
+            or renderer_format != 'json'
+        ):
+            return super().list(request, *args, **kwargs)
+        key = f'response:{self.response_digest}'
+        with timed(request, 'cache'):
+            cached = cache.get(key)
+        record_cache('response', cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = super().list(request, *args, **kwargs)
+
+        def store(response):
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    self.response_cache_timeout
+                )
+
+        response.add_post_render_callback(store)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        with timed(request, 'query'):
+            modified = self.get_object_modified()
+        if modified is None:
+            return super().retrieve(request, *args, **kwargs)
+        with timed(request, 'cache'):
+            versions = get_versions(*self.detail_version_labels)
+        modified = int(modified.timestamp() * 1000)
+        return self.conditional_response(
+            request,
+            (modified, versions),
+            max((modified,) + versions),
+            super().retrieve,
+            *args,
+            **kwargs
+        )
+
+
+class FieldsQueryMixin:
+    """Параметры ``?fields=`` и ``?expand=`` для GET запросов.
+
+    Списки через запятую попадают в контекст сериализатора; без ``fields``
+    ответ остаётся полным.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_query_list(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_requested_fields(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        return self.get_query_list(self.fields_query_param)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        context['expand'] = self.get_query_list(self.expand_query_param)
+        return context
+
+
+class ValuesListMixin(FieldsQueryMixin):
+    """Список через ``values_serializer_class``, минуя ModelSerializer."""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class(
+            context=self.get_serializer_context()
+        )
+        rows = serializer.prepare(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page)
+            )
+        return Response(serializer.to_representation(list(rows)))
+
+
+class MasterViewSet(TimingMixin,
+                    mixins.CreateModelMixin,
                     mixins.ListModelMixin,
                     mixins.DestroyModelMixin,
                     viewsets.GenericViewSet):
@@ -11,3 +245,17 @@ class MasterViewSet(mixins.CreateModelMixin,
     permission_classes = (IsAdminUserOrReadOnly,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
+    taxonomy_table = None
+
+    def list(self, request, *args, **kwargs):
+        """Без поиска список отдаётся из кеша справочников."""
+        if self.taxonomy_table is None or request.query_params.get(
+            filters.SearchFilter.search_param
+        ):
+            return super().list(request, *args, **kwargs)
+        table = getattr(get_taxonomy(), self.taxonomy_table)
+        data = [table.data[obj.pk] for obj in table.objects]
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
@@ -0,0 +1,264 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Max, Min, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from reviews.versions import get_versions
+
+from .stats import record_cache
+
+PAGINATION_PARAMS = ('limit', 'offset', 'cursor', 'count', 'pagination')
+
+
+def normalized_query(request, exclude=PAGINATION_PARAMS):
+    """Параметры запроса в каноничном виде: без служебных, по порядку."""
+    return tuple(
+        (key, tuple(sorted(request.query_params.getlist(key))))
+        for key in sorted(request.query_params)
+        if key not in exclude
+    )
+
+
+def get_dependencies(view, queryset=None):
+    """Модели, от которых зависит ответ представления."""
+    dependencies = getattr(view, 'cache_dependencies', None)
+    if dependencies is None:
+        model = (
+            queryset.model if queryset is not None
+            else view.get_queryset().model
+        )
+        dependencies = (model,)
+    return tuple(dependencies)
+
+
+class CachedCountPagination(LimitOffsetPagination):
+    """Limit/offset с кешированием ``count``.
+
+    Количество кешируется по пути и нормализованным параметрам фильтрации
+    и сбрасывается сменой версии данных зависимых моделей. Параметр
+    ``?count=estimate`` считает записи точно до ``estimate_limit``, а дальше
+    оценивает их по плотности совпадений среди ключей таблицы;
+    ``?count=none`` не считает их вовсе.
+    """
+    count_query_param = 'count'
+    count_modes = ('exact', 'estimate', 'none')
+    estimate_limit = 1000
+    count_cache_timeout = 60
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param)
+        return mode if mode in self.count_modes else 'exact'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.has_next = None
+        self.count_mode = self.get_count_mode(request)
+        if self.count_mode == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.count = None
+        if self.count_mode == 'estimate':
+            self.count = max(
+                self.get_estimated_count(queryset),
+                self.offset + len(rows)
+            )
+        return rows[:self.limit]
+
+    def get_count_key(self, queryset):
+        data = json.dumps([
+            self.request.path,
+            normalized_query(self.request),
+            get_versions(*get_dependencies(self.view, queryset)),
+        ])
+        return 'count:' + hashlib.md5(data.encode()).hexdigest()
+
+    def get_count(self, queryset):
+        if self.view is None or isinstance(queryset, list):
+            return super().get_count(queryset)
+        key = self.get_count_key(queryset)
+        count = cache.get(key)
+        record_cache('count', count is not None)
+        if count is None:
+            count = super().get_count(queryset)
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_estimated_count(self, queryset):
+        """Точное количество, если оно уже в кеше или не больше предела,
+        иначе оценка.
+
+        Если подходящих записей не меньше ``estimate_limit``, берётся ключ
+        последней из первых ``estimate_limit`` по порядку ключей: среди
+        ключей таблицы до него совпадений столько же, и доля переносится
+        на весь диапазон ключей.
+        """
+        key = self.get_count_key(queryset) if self.view else None
+        count = cache.get(key) if key else None
+        if count is not None:
+            return count
+        count = queryset[:self.estimate_limit].count()
+        if count < self.estimate_limit:
+            if key:
+                cache.set(key, count, self.count_cache_timeout)
+            return count
+        boundary = list(queryset.order_by('pk').values_list('pk', flat=True)[
+            self.estimate_limit - 1:self.estimate_limit
+        ])
+        bounds = queryset.model._default_manager.aggregate(
+            low=Min('pk'), high=Max('pk')
+        )
+        if not boundary or bounds['low'] is None:
+            return count
+        return round(
+            count * (bounds['high'] - bounds['low'] + 1)
+            / (boundary[0] - bounds['low'] + 1)
+        )
+
+    def get_next_link(self):
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+
+class KeysetPagination(CachedCountPagination):
+    """Limit/offset по умолчанию и keyset-пагинация по запросу.
+
+    Keyset-режим включается параметром ``?pagination=cursor`` или наличием
+    ``cursor``: страница выбирается условием по ключу ``ordering``
+    последней записи, поэтому глубокие страницы не сканируют предыдущие.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def use_keyset(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.limit = self.get_limit(request)
+        reverse, position = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        if position is not None:
+            queryset = queryset.filter(
+                self.position_filter(ordering, position)
+            )
+        rows = list(queryset.order_by(*ordering)[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.next_position = self.get_position(rows[-1]) if rows else None
+        self.previous_position = self.get_position(rows[0]) if rows else None
+        return rows
+
+    def position_filter(self, ordering, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, obj):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def encode_cursor(self, reverse, position):
+        data = json.dumps({'r': reverse, 'p': position}).encode()
+        return urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse, position = bool(data['r']), list(data['p'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def get_cursor_link(self, reverse, position):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(reverse, position)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.get_cursor_link(False, self.next_position)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self.get_cursor_link(True, self.previous_position)
+
+
+class UsernameKeysetPagination(KeysetPagination):
+    """Keyset-пагинация пользователей по уникальному ``username``."""
+    ordering = ('username',)
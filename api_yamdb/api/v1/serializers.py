@@ -1,9 +1,14 @@
+from django.utils import timezone
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
 
 from users.models import User
 
+from .taxonomy import get_taxonomy
+
 
 class SignUpSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
@@ -36,6 +41,28 @@ class ConfirmationCodeSerializer(serializers.Serializer):
         fields = ('username', 'confirmation_code')
 
 
+class IdListSerializer(serializers.Serializer):
+    """Список id через запятую, не длиннее ``context['limit']``."""
+    ids = serializers.CharField(required=True)
+
+    def validate_ids(self, value):
+        try:
+            ids = [int(pk) for pk in value.split(',') if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                'Перечислите id через запятую.'
+            )
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise serializers.ValidationError('Не передано ни одного id.')
+        limit = self.context['limit']
+        if len(ids) > limit:
+            raise serializers.ValidationError(
+                f'За один запрос можно получить не больше {limit} объектов.'
+            )
+        return ids
+
+
 class UsersSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -79,15 +106,70 @@ class CategorySerializer(serializers.ModelSerializer):
         )
 
 
-class TitleReadSerializer(serializers.ModelSerializer):
-    """Сериализатор объектов модели Title при GET запросах."""
-    genre = GenreSerializer(
-        many=True,
-        read_only=True
-    )
-    category = CategorySerializer(
-        read_only=True
-    )
+def requested_fields(available, context):
+    """Поля ответа из ``context['fields']`` в исходном порядке."""
+    fields = context.get('fields')
+    if fields is None:
+        return list(available)
+    return [name for name in available if name in fields]
+
+
+def expanded_fields(expandable, context):
+    """Раскрываемые связи: без ``fields`` раскрыты все, как раньше."""
+    if context.get('fields') is None:
+        return set(expandable)
+    return set(expandable) & set(context.get('expand') or ())
+
+
+class DynamicFieldsMixin:
+    """Оставляет в сериализаторе только поля из ``context['fields']``."""
+    expandable = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get('fields') is None:
+            return
+        allowed = requested_fields(self.fields, self.context)
+        for name in set(self.fields) - set(allowed):
+            self.fields.pop(name)
+
+    def is_expanded(self, name):
+        return name in expanded_fields(self.expandable, self.context)
+
+
+class TaxonomySlugField(serializers.SlugRelatedField):
+    """SlugRelatedField, который ищет жанр или категорию в кеше процесса."""
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        kwargs.setdefault('slug_field', 'slug')
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            taxonomy = self.context.get('taxonomy') or get_taxonomy()
+            obj = getattr(taxonomy, self.table).by_slug.get(data)
+        except TypeError:
+            self.fail('invalid')
+        if obj is None:
+            self.fail(
+                'does_not_exist',
+                slug_name=self.slug_field,
+                value=smart_str(data)
+            )
+        return obj
+
+
+class TitleReadSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Сериализатор объектов модели Title при GET запросах.
+
+    Жанры и категория берутся из кеша справочников по ``category_id`` и
+    предвыбранным связям ``genretitle_set``. Нераскрытые связи отдаются
+    slug.
+    """
+    expandable = ('genre', 'category')
+    genre = serializers.SerializerMethodField()
+    category = serializers.SerializerMethodField()
     rating = serializers.IntegerField(
         read_only=True
     )
@@ -104,16 +186,34 @@ class TitleReadSerializer(serializers.ModelSerializer):
             'category'
         )
 
+    def get_taxonomy(self):
+        if 'taxonomy' not in self.context:
+            self.context['taxonomy'] = get_taxonomy()
+        return self.context['taxonomy']
+
+    def get_genre(self, title):
+        genres = self.get_taxonomy().genres
+        ids = [link.genre_id for link in title.genretitle_set.all()]
+        if self.is_expanded('genre'):
+            return genres.represent(ids)
+        return genres.slugs(ids)
+
+    def get_category(self, title):
+        categories = self.get_taxonomy().categories
+        if self.is_expanded('category'):
+            return categories.data.get(title.category_id)
+        return categories.slug(title.category_id)
+
 
 class TitleSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Title."""
-    genre = serializers.SlugRelatedField(
-        slug_field='slug',
+    genre = TaxonomySlugField(
+        'genres',
         queryset=Genre.objects.all(),
         many=True
     )
-    category = serializers.SlugRelatedField(
-        slug_field='slug',
+    category = TaxonomySlugField(
+        'categories',
         queryset=Category.objects.all()
     )
 
@@ -135,13 +235,43 @@ class TitleSerializer(serializers.ModelSerializer):
         ]
 
     def to_representation(self, title):
-        serializer = TitleReadSerializer(title)
+        serializer = TitleReadSerializer(title, context=self.context)
         return serializer.data
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class TitleBulkItemSerializer(TitleSerializer):
+    """Элемент массовой записи произведений.
+
+    Уникальность пары (name, year) проверяется для всего списка сразу,
+    поэтому валидатор модели отключён. С ``id`` элемент обновляет
+    существующее произведение.
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta(TitleSerializer.Meta):
+        fields = ('id',) + TitleSerializer.Meta.fields
+        validators = []
+
+
+class TitleBulkSerializer(serializers.Serializer):
+    """Список произведений не длиннее ``context['limit']``."""
+    items = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False
+    )
+
+    def validate_items(self, value):
+        limit = self.context['limit']
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f'За один запрос можно записать не больше {limit} объектов.'
+            )
+        return value
+
+
+class CommentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для модели Comment."""
-    author = serializers.StringRelatedField(
+    author = serializers.SlugRelatedField(
+        slug_field='username',
         read_only=True
     )
 
@@ -155,9 +285,10 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для модели Review."""
-    author = serializers.StringRelatedField(
+    author = serializers.SlugRelatedField(
+        slug_field='username',
         read_only=True
     )
 
@@ -180,3 +311,142 @@ class ReviewSerializer(serializers.ModelSerializer):
         if Review.objects.filter(author=user, title_id=title_id).exists():
             raise serializers.ValidationError('Вы уже оставили отзыв.')
         return data
+
+
+def format_datetime(value, tz):
+    """То же, что DateTimeField.to_representation в формате ISO 8601."""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class ValuesSerializer:
+    """Быстрое чтение списков в обход ModelSerializer.
+
+    Строки берутся через ``.values()`` и собираются в словари с теми же
+    ключами, порядком и форматом, что у обычного сериализатора. ``columns``
+    задаёт для каждого поля ответа нужные колонки, поэтому при
+    ``context['fields']`` лишние колонки не выбираются.
+    """
+    columns = {}
+    required_columns = ('id',)
+    expandable = ()
+
+    def __init__(self, context=None):
+        self.context = context if context is not None else {}
+        self.fields = requested_fields(self.columns, self.context)
+        self.expand = expanded_fields(self.expandable, self.context)
+
+    @classmethod
+    def columns_for(cls, fields):
+        columns = dict.fromkeys(cls.required_columns)
+        for field in fields:
+            columns.update(dict.fromkeys(cls.columns[field]))
+        return tuple(columns)
+
+    def prepare(self, queryset):
+        return queryset.prefetch_related(None).values(
+            *self.columns_for(self.fields), *queryset.query.extra_select
+        )
+
+    def load(self, rows):
+        """Догружает данные для всей страницы разом."""
+
+    def get_field(self, name):
+        getter = getattr(self, f'get_{name}', None)
+        if getter is not None:
+            return getter
+        column = self.columns[name][0]
+        return lambda row: row[column]
+
+    def to_representation(self, rows):
+        self.load(rows)
+        getters = [(name, self.get_field(name)) for name in self.fields]
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+class TitleValuesSerializer(ValuesSerializer):
+    """Быстрый вариант TitleReadSerializer."""
+    columns = {
+        'id': ('id',),
+        'name': ('name',),
+        'year': ('year',),
+        'rating': ('score_sum', 'review_count'),
+        'description': ('description',),
+        'genre': ('id',),
+        'category': ('category_id',),
+    }
+    expandable = ('genre', 'category')
+
+    def load(self, rows):
+        taxonomy = self.context.get('taxonomy') or get_taxonomy()
+        self.genres, self.categories = taxonomy.genres, taxonomy.categories
+        self.links = {}
+        if 'genre' not in self.fields:
+            return
+        for title_id, genre_id in GenreTitle.objects.filter(
+            title_id__in=[row['id'] for row in rows]
+        ).order_by().values_list('title_id', 'genre_id'):
+            self.links.setdefault(title_id, []).append(genre_id)
+
+    def get_rating(self, row):
+        if not row['review_count']:
+            return None
+        return int(row['score_sum'] / row['review_count'])
+
+    def get_genre(self, row):
+        ids = self.links.get(row['id'], ())
+        if 'genre' in self.expand:
+            return self.genres.represent(ids)
+        return self.genres.slugs(ids)
+
+    def get_category(self, row):
+        if 'category' in self.expand:
+            return self.categories.data.get(row['category_id'])
+        return self.categories.slug(row['category_id'])
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """Быстрый вариант ReviewSerializer."""
+    columns = {
+        'id': ('id',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'score': ('score',),
+        'pub_date': ('pub_date',),
+    }
+    required_columns = ('id', 'pub_date')
+
+    def load(self, rows):
+        self.tz = timezone.get_current_timezone()
+
+    def get_pub_date(self, row):
+        return format_datetime(row['pub_date'], self.tz)
+
+
+class CommentValuesSerializer(ReviewValuesSerializer):
+    """Быстрый вариант CommentSerializer."""
+    columns = {
+        'id': ('id',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'pub_date': ('pub_date',),
+    }
+
+
+class ReviewExportSerializer(ReviewValuesSerializer):
+    """Строки выгрузки отзывов: поля списка и id произведения."""
+    columns = dict(ReviewValuesSerializer.columns, title=('title_id',))
+
+
+class CommentExportSerializer(CommentValuesSerializer):
+    """Строки выгрузки комментариев: поля списка и id отзыва."""
+    columns = dict(CommentValuesSerializer.columns, review=('review_id',))
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Параметры выгрузки: ``since`` — нижняя граница даты."""
+    since = serializers.DateTimeField(required=False)
@@ -0,0 +1,12 @@
+from collections import Counter
+
+from api_yamdb.metrics import CACHE_OPERATIONS
+
+cache_stats = Counter()
+
+
+def record_cache(name, hit):
+    """Учитывает попадание или промах кеша ``name`` в счётчиках процесса
+    и в метриках."""
+    cache_stats[f'{name}_{"hits" if hit else "misses"}'] += 1
+    CACHE_OPERATIONS.inc(cache=name, result='hit' if hit else 'miss')
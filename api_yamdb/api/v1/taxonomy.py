@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+from reviews.models import Category, Genre
+from reviews.versions import get_versions
+
+from .stats import record_cache
+
+Taxonomy = namedtuple('Taxonomy', ('genres', 'categories', 'versions'))
+
+
+class TaxonomyTable:
+    """Копия небольшой таблицы со slug: объекты, индексы и представление."""
+    fields = ('name', 'slug')
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.by_id = {obj.pk: obj for obj in objects}
+        self.by_slug = {obj.slug: obj for obj in objects}
+        self.position = {obj.pk: index for index, obj in enumerate(objects)}
+        self.data = {
+            obj.pk: {field: getattr(obj, field) for field in self.fields}
+            for obj in objects
+        }
+
+    def ordered(self, ids):
+        known = [pk for pk in ids if pk in self.data]
+        return sorted(known, key=self.position.get)
+
+    def represent(self, ids):
+        """Представления объектов по id в порядке сортировки модели."""
+        return [self.data[pk] for pk in self.ordered(ids)]
+
+    def slugs(self, ids):
+        return [self.by_id[pk].slug for pk in self.ordered(ids)]
+
+    def slug(self, pk):
+        obj = self.by_id.get(pk)
+        return obj.slug if obj is not None else None
+
+
+class TaxonomyCache:
+    """Жанры и категории в памяти процесса.
+
+    Перед выдачей снимка сверяются версии данных из общего кеша, поэтому
+    запись в любом воркере (API, админка, load_data) приводит к
+    перечитыванию таблиц во всех остальных.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+
+    def get(self):
+        versions = get_versions(Genre, Category)
+        snapshot = self.snapshot
+        fresh = snapshot is not None and snapshot.versions == versions
+        record_cache('taxonomy', fresh)
+        if not fresh:
+            snapshot = Taxonomy(
+                genres=TaxonomyTable(list(Genre.objects.all())),
+                categories=TaxonomyTable(list(Category.objects.all())),
+                versions=versions
+            )
+            self.snapshot = snapshot
+        return snapshot
+
+
+taxonomy_cache = TaxonomyCache()
+
+
+def get_taxonomy():
+    return taxonomy_cache.get()
@@ -1,9 +1,9 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework import routers
 
 from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
                     ReviewViewSet, TitleViewSet, UsersViewSet,
-                    sign_up, getting_token)
+                    cache_stats, export, sign_up, getting_token)
 
 v1_router = routers.DefaultRouter()
 v1_router.register('categories', CategoryViewSet, basename='categories')
@@ -30,6 +30,12 @@ auth_urls = [
 ]
 
 urlpatterns = [
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    re_path(
+        r'^export/(?P<resource>titles|reviews|comments)\.(?P<ext>ndjson|csv)$',
+        export,
+        name='export'
+    ),
     path('', include(v1_router.urls)),
     path('auth/', include(auth_urls)),
 ]
@@ -1,23 +1,37 @@
+from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import AccessToken
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
+from reviews.versions import AUTHOR_NAMES, version_label
 from users.models import User
 
+from . import stats
+from .bulk import save_titles
+from .export import ExportRenderer, export_response
 from .filters import TitleFilter
-from .mixins import MasterViewSet
+from .mixins import (ConditionalGetMixin, MasterViewSet, TimingMixin,
+                     ValuesListMixin)
+from .pagination import KeysetPagination, UsernameKeysetPagination
 from .permissions import (IsAdminModerAuthor, IsAdminOrSuper,
                           IsAdminUserOrReadOnly)
 from .serializers import (CategorySerializer, CommentSerializer,
-                          ConfirmationCodeSerializer, GenreSerializer,
-                          ReviewSerializer, SignUpSerializer,
-                          TitleReadSerializer, TitleSerializer,
+                          CommentValuesSerializer, ConfirmationCodeSerializer,
+                          ExportQuerySerializer, GenreSerializer,
+                          IdListSerializer, ReviewSerializer,
+                          ReviewValuesSerializer, SignUpSerializer,
+                          TitleBulkSerializer, TitleReadSerializer,
+                          TitleSerializer, TitleValuesSerializer,
                           UserMeSerializer, UsersSerializer)
 
 
@@ -63,9 +77,36 @@ def getting_token(request):
     return Response(content, status=status.HTTP_201_CREATED)
 
 
-class UsersViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdminOrSuper])
+def cache_stats(request):
+    """Счётчики попаданий и промахов кешей текущего процесса."""
+    return Response(dict(sorted(stats.cache_stats.items())))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdminOrSuper])
+@renderer_classes([JSONRenderer, ExportRenderer])
+def export(request, resource, ext):
+    """Потоковая выгрузка произведений, отзывов или комментариев.
+
+    ``?since=`` оставляет отзывы и комментарии не старше указанного
+    момента, а для произведений — изменённые после него.
+    """
+    serializer = ExportQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return export_response(
+        resource,
+        ext,
+        since=serializer.validated_data.get('since'),
+        chunk_size=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    )
+
+
+class UsersViewSet(TimingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UsersSerializer
+    pagination_class = UsernameKeysetPagination
     permission_classes = (permissions.IsAuthenticated, IsAdminOrSuper,)
     filter_backends = (filters.SearchFilter,)
     filterset_fields = ('username',)
@@ -92,10 +133,12 @@ class UsersViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CategoryViewSet(MasterViewSet):
+class CategoryViewSet(ConditionalGetMixin, MasterViewSet):
     """Viewset для объектов модели Category."""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    taxonomy_table = 'categories'
+    cache_responses = True
 
     @action(
         methods=['DELETE'],
@@ -109,10 +152,12 @@ class CategoryViewSet(MasterViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class GenreViewSet(MasterViewSet):
+class GenreViewSet(ConditionalGetMixin, MasterViewSet):
     """Viewset для объектов модели Genre."""
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    taxonomy_table = 'genres'
+    cache_responses = True
 
     @action(
         methods=['DELETE'],
@@ -126,48 +171,167 @@ class GenreViewSet(MasterViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(TimingMixin, ConditionalGetMixin, ValuesListMixin,
+                   viewsets.ModelViewSet):
     """Viewset для объектов модели Title."""
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+    queryset = Title.objects.prefetch_related(
+        Prefetch('genretitle_set', queryset=GenreTitle.objects.order_by())
+    )
     serializer_class = TitleSerializer
+    values_serializer_class = TitleValuesSerializer
+    cache_dependencies = (Title, Genre, GenreTitle, Category)
+    version_labels = cache_dependencies + (Review,)
+    detail_version_labels = (Genre, GenreTitle, Category)
+    cache_responses = True
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
     permission_classes = (IsAdminUserOrReadOnly,)
 
-    def get_serializer_method(self):
-        if self.request.method == 'GET':
+    batch_limit = getattr(settings, 'TITLE_BATCH_LIMIT', 100)
+    bulk_limit = getattr(settings, 'TITLE_BULK_LIMIT', 5000)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='batch',
+        url_name='batch'
+    )
+    def batch(self, request):
+        """Произведения по ``?ids=`` в заданном порядке за два запроса."""
+        serializer = IdListSerializer(
+            data=request.query_params,
+            context={'limit': self.batch_limit}
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        values_serializer = TitleValuesSerializer(
+            context=self.get_serializer_context()
+        )
+        rows = list(values_serializer.prepare(
+            self.get_queryset().filter(pk__in=ids)
+        ))
+        found = dict(zip(
+            (row['id'] for row in rows),
+            values_serializer.to_representation(rows)
+        ))
+        return Response({
+            'results': [found[pk] for pk in ids if pk in found],
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='bulk',
+        url_name='bulk',
+        permission_classes=(permissions.IsAuthenticated, IsAdminOrSuper)
+    )
+    def bulk(self, request):
+        """Массовое создание и обновление произведений.
+
+        Принимает список произведений или ``{"items": [...]}``, отвечает
+        статусом, id или ошибками для каждого элемента по порядку.
+        """
+        data = request.data
+        if isinstance(data, list):
+            data = {'items': data}
+        serializer = TitleBulkSerializer(
+            data=data,
+            context={'limit': self.bulk_limit}
+        )
+        serializer.is_valid(raise_exception=True)
+        results = save_titles(
+            serializer.validated_data['items'],
+            self.get_serializer_context()
+        )
+        return Response({'results': results})
+
+    def get_queryset(self):
+        """Для чтения с ``fields`` выбирает только нужные колонки."""
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        fields = [name for name in TitleValuesSerializer.columns
+                  if name in fields]
+        if 'genre' not in fields:
+            queryset = queryset.prefetch_related(None)
+        return queryset.only(*TitleValuesSerializer.columns_for(fields))
+
+    def get_serializer_class(self):
+        if self.request.method in permissions.SAFE_METHODS:
             return TitleReadSerializer
         return TitleSerializer
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(TimingMixin, ConditionalGetMixin, ValuesListMixin,
+                     viewsets.ModelViewSet):
     """ViewSet для объектов модели Comment."""
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
+    pagination_class = KeysetPagination
     permission_classes = (IsAdminModerAuthor,)
+    detail_version_labels = (AUTHOR_NAMES,)
 
     def get_review(self):
         review_id = self.kwargs.get('review_id')
         return get_object_or_404(Review, pk=review_id)
 
+    def get_modified_queryset(self):
+        return Comment.objects.filter(review_id=self.kwargs.get('review_id'))
+
+    def get_version_labels(self):
+        review_id = self.kwargs.get('review_id')
+        return (
+            version_label(Comment, review=review_id),
+            version_label(Review, pk=review_id),
+            AUTHOR_NAMES
+        )
+
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return self.get_review().comments.select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, review=self.get_review())
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(TimingMixin, ConditionalGetMixin, ValuesListMixin,
+                    viewsets.ModelViewSet):
     """ViewSet для объектов модели Review."""
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
+    pagination_class = KeysetPagination
     permission_classes = (IsAdminModerAuthor,)
+    detail_version_labels = (AUTHOR_NAMES,)
+    cache_responses = True
 
     def get_title(self):
         title_id = self.kwargs.get('title_id')
         return get_object_or_404(Title, pk=title_id)
 
+    def get_modified_queryset(self):
+        return Review.objects.filter(title_id=self.kwargs.get('title_id'))
+
+    def get_version_labels(self):
+        title_id = self.kwargs.get('title_id')
+        return (
+            version_label(Review, title=title_id),
+            version_label(Title, pk=title_id),
+            AUTHOR_NAMES
+        )
+
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return self.get_title().reviews.select_related('author')
 
+    @transaction.atomic
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(author=user, title=self.get_title())
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
@@ -0,0 +1,35 @@
+import os
+from contextlib import contextmanager
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+LOCK_FILE = 'lock'
+
+
+class LockedFileBasedCache(FileBasedCache):
+    """Файловый кеш, в котором add и incr атомарны между процессами.
+
+    В FileBasedCache это проверка и запись отдельными операциями: два
+    воркера, сдвигающие одну версию, получили бы одно значение. Здесь
+    они выполняются под блокировкой файла в каталоге кеша, что работает
+    в пределах одной машины, как и сам файловый кеш.
+    """
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self._dir, exist_ok=True)
+        with open(os.path.join(self._dir, LOCK_FILE), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def add(self, *args, **kwargs):
+        with self.locked():
+            return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with self.locked():
+            return super().incr(*args, **kwargs)
@@ -0,0 +1,340 @@
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .queries import QueryCounter, wrap_queries
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Заголовок файла — занятый объём; записи выровнены по 8 байт.
+HEADER_SIZE = 8
+INITIAL_SIZE = 1 << 16
+FILE_SUFFIX = '.db'
+
+
+def padding(position):
+    return (8 - position % 8) % 8
+
+
+def read_entries(data, used):
+    """Записи файла метрик: ключ, значение и смещение значения."""
+    position = HEADER_SIZE
+    while position < used:
+        length, = struct.unpack_from('i', data, position)
+        position += 4
+        key = bytes(data[position:position + length]).decode()
+        position += length
+        position += padding(position)
+        value, = struct.unpack_from('d', data, position)
+        yield key, value, position
+        position += 8
+
+
+class MetricsFile:
+    """Значения метрик одного процесса в файле, отображённом в память.
+
+    Пишет только процесс-владелец, а читать файл может любой процесс:
+    занятый объём в заголовке обновляется после того, как запись
+    полностью на месте.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER_SIZE:
+            size = INITIAL_SIZE
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used, = struct.unpack_from('i', self.map, 0)
+        if not self.used:
+            self.used = HEADER_SIZE
+            struct.pack_into('i', self.map, 0, self.used)
+        self.positions = {
+            key: position
+            for key, _, position in read_entries(self.map, self.used)
+        }
+
+    def grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def append(self, key):
+        encoded = key.encode()
+        start = self.used + 4 + len(encoded)
+        position = start + padding(start)
+        if position + 8 > len(self.map):
+            self.grow(position + 8)
+        struct.pack_into(
+            f'i{len(encoded)}s', self.map, self.used, len(encoded), encoded
+        )
+        struct.pack_into('d', self.map, position, 0.0)
+        self.used = position + 8
+        struct.pack_into('i', self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self.append(key)
+        value, = struct.unpack_from('d', self.map, position)
+        struct.pack_into('d', self.map, position, value + amount)
+
+
+class Store:
+    """Файл метрик текущего процесса в ``METRICS_DIR``.
+
+    После fork у рабочего процесса другой pid, и он открывает свой файл.
+    Ошибка файловой системы не должна ронять запрос: она пишется в лог,
+    и для этого каталога и процесса метрики отключаются.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.owner = None
+        self.file = None
+        self.failed = None
+
+    def add(self, key, amount):
+        owner = (settings.METRICS_DIR, os.getpid())
+        with self.lock:
+            if owner == self.failed:
+                return
+            try:
+                if self.owner != owner:
+                    self.open(*owner)
+                self.file.add(key, amount)
+            except OSError:
+                logger.exception(
+                    'Метрики отключены: не удалось записать в %s', owner[0]
+                )
+                self.failed = owner
+                self.owner = self.file = None
+
+    def open(self, directory, pid):
+        os.makedirs(directory, exist_ok=True)
+        self.file = MetricsFile(
+            os.path.join(directory, f'{pid}{FILE_SUFFIX}')
+        )
+        self.owner = (directory, pid)
+
+
+store = Store()
+
+
+def metric_key(name, labels):
+    return json.dumps([name, labels], sort_keys=True, ensure_ascii=False)
+
+
+def collect(directory=None):
+    """Сумма значений по всем файлам процессов: ключ -> значение."""
+    directory = directory or settings.METRICS_DIR
+    totals = defaultdict(float)
+    if not os.path.isdir(directory):
+        return totals
+    for name in os.listdir(directory):
+        if not name.endswith(FILE_SUFFIX):
+            continue
+        with open(os.path.join(directory, name), 'rb') as metrics_file:
+            data = metrics_file.read()
+        if len(data) < HEADER_SIZE:
+            continue
+        used, = struct.unpack_from('i', data, 0)
+        for key, value, _ in read_entries(data, used):
+            totals[key] += value
+    return totals
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        store.add(metric_key(self.name, labels), amount)
+
+    def samples(self, entries):
+        return sorted(
+            (entry for entry in entries if entry[0] == self.name),
+            key=lambda entry: sorted(entry[1].items())
+        )
+
+
+class Histogram(Counter):
+    """Гистограмма: в файле лежат некумулятивные корзины, сумма и
+    количество; кумулятивные корзины собираются при выдаче."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        for bound in self.buckets:
+            if value <= bound:
+                break
+        store.add(
+            metric_key(
+                f'{self.name}_bucket', dict(labels, le=format_value(bound))
+            ),
+            1
+        )
+        store.add(metric_key(f'{self.name}_sum', labels), value)
+        store.add(metric_key(f'{self.name}_count', labels), 1)
+
+    def samples(self, entries):
+        series = defaultdict(dict)
+        for name, labels, value in entries:
+            if not name.startswith(f'{self.name}_'):
+                continue
+            labels = dict(labels)
+            bound = labels.pop('le', None)
+            suffix = name[len(self.name) + 1:]
+            key = json.dumps(labels, sort_keys=True)
+            series[key][bound if suffix == 'bucket' else suffix] = value
+        result = []
+        for key in sorted(series):
+            labels, values = json.loads(key), series[key]
+            total = 0.0
+            for bound in map(format_value, self.buckets):
+                total += values.get(bound, 0.0)
+                result.append(
+                    (f'{self.name}_bucket', dict(labels, le=bound), total)
+                )
+            for suffix in ('sum', 'count'):
+                result.append(
+                    (f'{self.name}_{suffix}', labels, values.get(suffix, 0.0))
+                )
+        return result
+
+
+registry = []
+
+REQUESTS = Counter(
+    'api_requests_total',
+    'Ответы по маршруту, методу и статусу.',
+    ('route', 'method', 'status')
+)
+LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Время обработки запроса.',
+    ('route', 'method'),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+QUERIES = Histogram(
+    'api_request_queries',
+    'SQL-запросов на один запрос к сайту.',
+    ('route',),
+    (0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+RESPONSE_BYTES = Histogram(
+    'api_response_bytes',
+    'Размер тела ответа.',
+    ('route',),
+    (100, 1000, 10000, 100000, 1000000, 10000000)
+)
+CACHE_OPERATIONS = Counter(
+    'api_cache_operations_total',
+    'Попадания и промахи кешей.',
+    ('cache', 'result')
+)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def render(values):
+    """Текстовый формат Prometheus для собранных значений."""
+    entries = [(*json.loads(key), value) for key, value in values.items()]
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples(entries):
+            label_text = ','.join(
+                f'{label}="{escape(text)}"'
+                for label, text in sorted(labels.items())
+            )
+            lines.append(f'{name}{{{label_text}}} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики всех процессов в формате Prometheus."""
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+def counted_stream(content, observe):
+    """Отдаёт потоковый ответ и сообщает его размер после отправки."""
+    size = 0
+    try:
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        observe(size)
+
+
+class MetricsMiddleware:
+    """Время, статус, число SQL и размер ответа по имени маршрута DRF.
+
+    Маршрут — ``resolver_match.view_name``, например
+    ``api:titles-detail``, поэтому id в адресе не плодят новые ряды.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with wrap_queries(QueryCounter()) as counter:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else '<unmatched>'
+        REQUESTS.inc(
+            route=route,
+            method=request.method,
+            status=str(response.status_code)
+        )
+        LATENCY.observe(elapsed, route=route, method=request.method)
+        QUERIES.observe(counter.count, route=route)
+
+        def observe_size(size):
+            RESPONSE_BYTES.observe(size, route=route)
+
+        if response.streaming:
+            response.streaming_content = counted_stream(
+                response.streaming_content, observe_size
+            )
+        else:
+            observe_size(len(response.content))
+        return response
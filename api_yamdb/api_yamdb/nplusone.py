@@ -0,0 +1,153 @@
+import logging
+import re
+import sys
+import sysconfig
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.views import View
+from rest_framework.permissions import BasePermission
+from rest_framework.serializers import BaseSerializer
+
+from .queries import wrap_queries
+
+logger = logging.getLogger(__name__)
+
+# Код библиотек и самого детектора не считается местом, откуда пришёл
+# запрос: ищется ближайший кадр проекта или тестов.
+LIBRARY_PATHS = tuple({
+    sysconfig.get_paths()[name] for name in ('stdlib', 'purelib', 'platlib')
+})
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+\b')
+IN_LIST = re.compile(r'IN \((?:\s*(?:%s|\?)\s*,?)+\)')
+
+Finding = namedtuple('Finding', ('sql', 'count', 'origins'))
+
+
+class NPlusOneError(Exception):
+    """Повторяющиеся однотипные запросы в одном запросе к API."""
+
+    def __init__(self, findings):
+        self.findings = findings
+        super().__init__('\n'.join(map(describe_finding, findings)))
+
+
+def fingerprint(sql):
+    """SQL без значений: одинаковые по структуре запросы совпадают."""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def is_project_file(filename):
+    return filename != __file__ and not filename.startswith(LIBRARY_PATHS)
+
+
+def describe_frame(frame):
+    """Поле сериализатора, разрешение, колонка админки или view кадра."""
+    code = frame.f_code
+    variables = frame.f_locals
+    # type(), а не isinstance: isinstance вычислил бы ленивый объект
+    # вроде request.user и сделал бы ещё один запрос.
+    owner = type(variables.get('self'))
+    if (
+        issubclass(owner, BaseSerializer)
+        and code.co_name == 'to_representation'
+        and 'field' in variables
+    ):
+        return f'{owner.__name__}.{variables["field"].field_name}'
+    if issubclass(owner, BasePermission):
+        return f'{owner.__name__}.{code.co_name}'
+    if code.co_name == 'items_for_result' and 'cl' in variables:
+        return (
+            f'{type(variables["cl"].model_admin).__name__}.list_display.'
+            f'{variables.get("field_name")}'
+        )
+    if issubclass(owner, View):
+        return f'{owner.__name__}.{code.co_name}'
+    return None
+
+
+def find_origin(frame):
+    """Откуда пришёл запрос: компонент API и строка кода проекта."""
+    location = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if location is None and is_project_file(filename):
+            location = f'{filename}:{frame.f_lineno}'
+        component = describe_frame(frame)
+        if component is not None:
+            return f'{component} ({location})' if location else component
+        frame = frame.f_back
+    return location or 'неизвестно'
+
+
+def describe_finding(finding):
+    origins = ', '.join(
+        f'{origin} ×{count}' for origin, count in finding.origins.most_common()
+    )
+    return f'{finding.count} однотипных запросов из {origins}: {finding.sql}'
+
+
+class QueryDetector:
+    """Обёртка execute, которая группирует SELECT по структуре."""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            origins = self.queries.setdefault(fingerprint(sql), Counter())
+            origins[find_origin(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def findings(self, threshold):
+        """Запросы, повторившиеся больше ``threshold`` раз."""
+        return [
+            Finding(sql, sum(origins.values()), origins)
+            for sql, origins in self.queries.items()
+            if sum(origins.values()) > threshold
+        ]
+
+
+@contextmanager
+def detect_queries(threshold=None, raise_errors=None):
+    """Ищет N+1 в запросах блока ко всем базам.
+
+    По умолчанию порог и реакция берутся из ``NPLUSONE_THRESHOLD`` и
+    ``NPLUSONE_RAISE``: находки пишутся в лог или поднимают
+    NPlusOneError.
+    """
+    if threshold is None:
+        threshold = settings.NPLUSONE_THRESHOLD
+    if raise_errors is None:
+        raise_errors = settings.NPLUSONE_RAISE
+    with wrap_queries(QueryDetector()) as detector:
+        yield detector
+    findings = detector.findings(threshold)
+    if findings and raise_errors:
+        raise NPlusOneError(findings)
+    for finding in findings:
+        logger.warning('N+1: %s', describe_finding(finding))
+
+
+class NPlusOneMiddleware:
+    """Проверяет каждый запрос к сайту, если включён
+    ``NPLUSONE_DETECTION``.
+
+    Запросы, которые потоковый ответ (выгрузки) делает при отдаче тела,
+    выполняются уже после middleware и не проверяются: выгрузка и так
+    повторяет однотипные запросы по пачкам.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.NPLUSONE_DETECTION:
+            return self.get_response(request)
+        with detect_queries():
+            return self.get_response(request)
@@ -0,0 +1,23 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Обёртка execute на всех подключениях к базам на время блока."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+class QueryCounter:
+    """Считает SQL-запросы через execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api_yamdb.metrics.MetricsMiddleware',
+    'api_yamdb.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +39,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api_yamdb.nplusone.NPlusOneMiddleware',
+    'api_yamdb.slowlog.SlowQueryMiddleware',
 ]
 
 ROOT_URLCONF = 'api_yamdb.urls'
@@ -67,13 +71,55 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.v1.pagination.CachedCountPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ]
 }
 
+TITLE_BATCH_LIMIT = 100
+
+TITLE_BULK_LIMIT = 5000
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Кеш готовых JSON-ответов списков с cache_responses. ETag и ответы 304
+# от него не зависят.
+RESPONSE_CACHE = True
+
+# Поиск N+1: больше NPLUSONE_THRESHOLD однотипных SELECT за запрос
+# попадают в лог или, с NPLUSONE_RAISE, приводят к ошибке. Поиск
+# проходит по стеку на каждый SELECT, поэтому включается явно: при
+# разработке и в тестах (tests/fixtures/fixture_nplusone.py).
+NPLUSONE_DETECTION = False
+
+NPLUSONE_THRESHOLD = 2
+
+NPLUSONE_RAISE = False
+
+# Заголовок Server-Timing для всех ответов; без него — только по заголовку
+# запроса X-Server-Timing и только администраторам.
+SERVER_TIMING = False
+
+# Файлы метрик рабочих процессов для /metrics. Каталог стоит очищать при
+# перезапуске сервиса: счётчики завершившихся процессов остаются в сумме.
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(BASE_DIR, 'metrics')
+)
+
+# SQL-запросы дольше SLOW_QUERY_MS мс с планом выполнения пишутся в
+# SLOW_QUERY_LOG в формате JSON Lines; None выключает журнал. Каждый
+# процесс пишет и ротирует свой файл с pid в имени, например
+# slow_queries.1234.jsonl; manage.py slow_queries читает их все.
+SLOW_QUERY_MS = 200
+
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'logs', 'slow_queries.jsonl')
+
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+SLOW_QUERY_LOG_BACKUPS = 5
+
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',)
 }
@@ -94,6 +140,32 @@ DATABASES = {
 }
 
 
+# Cache
+# Версии данных, закешированные count и справочники сверяются всеми
+# воркерами, поэтому кеш должен быть общим для процессов. Файловый кеш
+# работает на одной машине, для нескольких нужен memcached или redis.
+# Версии лежат в отдельном кеше без срока жизни: вытеснение ответов их
+# не задевает, а incr и add в нём атомарны.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'versions': {
+        'BACKEND': 'api_yamdb.cache.LockedFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'versions'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .nplusone import fingerprint
+from .queries import wrap_queries
+
+logger = logging.getLogger(__name__)
+
+handler_lock = threading.Lock()
+current_handler = None
+failed_key = None
+
+
+def process_log_path(path, pid):
+    """Журнал процесса: ``slow_queries.jsonl`` -> ``slow_queries.<pid>.jsonl``.
+
+    У каждого рабочего процесса свой файл и своя ротация: обработчики
+    разных процессов, ротирующие один файл, теряют и затирают записи.
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}.{pid}{ext}'
+
+
+def get_handler():
+    """Обработчик с ротацией для текущих настроек журнала и процесса.
+
+    Если каталог или файл журнала не открываются, ошибка пишется в лог
+    один раз и для этого пути и процесса журнал отключается: запрос к
+    сайту не должен падать из-за журнала.
+    """
+    global current_handler, failed_key
+    key = (
+        settings.SLOW_QUERY_LOG,
+        settings.SLOW_QUERY_LOG_MAX_BYTES,
+        settings.SLOW_QUERY_LOG_BACKUPS,
+        os.getpid(),
+    )
+    with handler_lock:
+        if key == failed_key:
+            return None
+        if current_handler is None or current_handler.key != key:
+            if current_handler is not None:
+                current_handler.close()
+                current_handler = None
+            path, max_bytes, backups, pid = key
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                current_handler = RotatingFileHandler(
+                    process_log_path(path, pid), maxBytes=max_bytes,
+                    backupCount=backups, encoding='utf-8'
+                )
+            except OSError:
+                logger.exception(
+                    'Журнал медленных запросов отключён: '
+                    'не удалось открыть %s', path
+                )
+                failed_key = key
+                return None
+            current_handler.key = key
+        return current_handler
+
+
+def write_record(record):
+    handler = get_handler()
+    if handler is None:
+        return
+    handler.handle(logging.makeLogRecord({
+        'msg': json.dumps(record, ensure_ascii=False, default=str),
+    }))
+
+
+def explain(connection, sql, params):
+    """План запроса курсором бэкенда, в обход обёрток execute."""
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix()} {sql}', params
+        )
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    """Обёртка execute: запросы дольше ``threshold`` мс уходят в журнал
+    вместе с маршрутом запроса к сайту и планом выполнения."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed >= self.threshold:
+            self.record(sql, params, many, context['connection'], elapsed)
+        return result
+
+    def record(self, sql, params, many, connection, elapsed):
+        match = getattr(self.request, 'resolver_match', None)
+        write_record({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(elapsed, 3),
+            'database': connection.alias,
+            'route': match.view_name if match else None,
+            'method': self.request.method,
+            'path': self.request.path,
+            'fingerprint': fingerprint(sql),
+            'sql': sql,
+            'params': None if many else params,
+            'many': many,
+            'plan': None if many else explain(connection, sql, params),
+        })
+
+
+class SlowQueryMiddleware:
+    """Журнал медленных SQL-запросов, если задан ``SLOW_QUERY_MS``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_MS
+        if threshold is None:
+            return self.get_response(request)
+        with wrap_queries(SlowQueryLog(request, threshold)):
+            return self.get_response(request)
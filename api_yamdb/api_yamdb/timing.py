@@ -0,0 +1,125 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.dispatch import Signal
+
+from .queries import wrap_queries
+
+# Отправляется после каждого замеренного запроса: request и record —
+# RequestTimings с фазами и SQL, record.as_dict() готов для логов.
+request_timed = Signal(providing_args=['request', 'record'])
+
+REQUEST_HEADER = 'HTTP_X_SERVER_TIMING'
+
+
+class RequestTimings:
+    """Время фаз одного запроса к сайту и его SQL.
+
+    Фазы вложены: время вложенной фазы не входит во внешнюю, поэтому
+    сумма фаз не больше общего времени. Объект же служит обёрткой
+    execute и считает запросы к базе.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self.query_time = 0.0
+        self.started = time.perf_counter()
+        self.total = None
+        self.stack = []
+
+    def start(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            parent = self.stack[-1]
+            self.phases[parent[0]] += now - parent[1]
+        self.phases.setdefault(name, 0.0)
+        self.stack.append([name, now])
+
+    def stop(self):
+        now = time.perf_counter()
+        name, since = self.stack.pop()
+        self.phases[name] += now - since
+        if self.stack:
+            self.stack[-1][1] = now
+
+    @contextmanager
+    def phase(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+    def finish(self):
+        while self.stack:
+            self.stop()
+        self.total = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'total_ms': self.total * 1000,
+            'phases': {
+                name: seconds * 1000 for name, seconds in self.phases.items()
+            },
+            'sql': {'count': self.queries, 'ms': self.query_time * 1000},
+        }
+
+    def header(self):
+        """Значение заголовка Server-Timing."""
+        items = [
+            f'{name};dur={seconds * 1000:.2f}'
+            for name, seconds in self.phases.items()
+        ]
+        items.append(
+            f'db;dur={self.query_time * 1000:.2f};desc="{self.queries} SQL"'
+        )
+        items.append(f'total;dur={self.total * 1000:.2f}')
+        return ', '.join(items)
+
+
+def timed(request, name):
+    """Фаза ``name`` запроса, если он замеряется, иначе пустой контекст."""
+    record = getattr(request, 'timings', None)
+    if record is None:
+        return nullcontext()
+    return record.phase(name)
+
+
+class ServerTimingMiddleware:
+    """Замеряет запрос и добавляет заголовок Server-Timing.
+
+    С ``SERVER_TIMING`` замеряются все запросы и заголовок получают все.
+    Иначе замер включает заголовок запроса ``X-Server-Timing``, а ответ
+    с разбивкой получает только администратор. Без замера middleware
+    лишь проверяет настройку и заголовок.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        public = settings.SERVER_TIMING
+        if not public and REQUEST_HEADER not in request.META:
+            return self.get_response(request)
+        record = RequestTimings()
+        request.timings = record
+        with wrap_queries(record):
+            response = self.get_response(request)
+        record.finish()
+        user = getattr(request, 'user', None)
+        if public or getattr(user, 'is_admin', False):
+            response['Server-Timing'] = record.header()
+        request_timed.send(
+            sender=self.__class__, request=request, record=record
+        )
+        return response
@@ -42,6 +42,7 @@ class TitleAdmin(admin.ModelAdmin):
         'category'
     )
     list_per_page = per_page
+    list_select_related = ('category',)
     list_filter = ('name',)
     search_fields = ('name', 'year', 'category')
     empty_value_display = '-пусто-'
@@ -57,6 +58,7 @@ class GenreTitleAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     list_filter = ('genre',)
     list_per_page = per_page
+    list_select_related = ('genre', 'title')
     search_fields = ('title',)
 
 
@@ -77,6 +79,7 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ('author', 'score', 'pub_date')
     search_fields = ('author',)
     list_per_page = per_page
+    list_select_related = ('title', 'author')
     empty_value_display = '-пусто-'
     inlines = [CommentInLine]
 
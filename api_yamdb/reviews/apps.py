@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    from reviews.search import ensure_index
+
+    ensure_index(connections[using])
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        import reviews.signals  # noqa: F401
+
+        post_migrate.connect(ensure_search_index, sender=self)
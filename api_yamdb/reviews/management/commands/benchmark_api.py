@@ -0,0 +1,495 @@
+import io
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from fnmatch import fnmatch
+from itertools import count
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_yamdb.queries import QueryCounter, wrap_queries
+from reviews.models import Category, Comment, Genre, Review, Title
+
+from users.models import User
+
+from .benchmark_load_data import temporary_database
+
+FORMAT_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+# ``user``: None — анонимный запрос, 'user' или 'admin' — с токеном.
+# Строки в ``data`` форматируются номером запроса ``n`` и кодом ``code``.
+Route = namedtuple('Route', ('name', 'method', 'url', 'data', 'user'))
+Route.__new__.__defaults__ = (None, None)
+
+
+def calibrate():
+    """Миллисекунды на неизменную работу на чистом Python: мерило
+    скорости машины в момент замера."""
+    started = time.perf_counter()
+    sum(value * value for value in range(20000))
+    return (time.perf_counter() - started) * 1000
+
+
+def percentile(samples, rank):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * rank / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples):
+    result = {f'p{rank}': percentile(samples, rank) for rank in PERCENTILES}
+    result['mean'] = statistics.mean(samples)
+    return result
+
+
+def mann_whitney(base, new):
+    """Односторонний U-критерий Манна — Уитни: p-value того, что ``new``
+    не больше ``base``.
+
+    Нормальное приближение с поправкой на совпадения и непрерывность;
+    распределения задержек далеки от нормальных, поэтому сравниваются
+    ранги, а не средние.
+    """
+    combined = sorted(
+        [(value, 0) for value in base] + [(value, 1) for value in new]
+    )
+    total = len(combined)
+    rank_sum = ties = 0
+    start = 0
+    while start < total:
+        end = start
+        while end + 1 < total and combined[end + 1][0] == combined[start][0]:
+            end += 1
+        size = end - start + 1
+        ties += size ** 3 - size
+        average = (start + end) / 2 + 1
+        rank_sum += average * sum(
+            group for _, group in combined[start:end + 1]
+        )
+        start = end + 1
+    count_base, count_new = len(base), len(new)
+    u_new = rank_sum - count_new * (count_new + 1) / 2
+    mean = count_base * count_new / 2
+    variance = count_base * count_new / 12 * (
+        total + 1 - ties / (total * (total - 1))
+    )
+    if variance <= 0:
+        return 1.0
+    z = (u_new - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def machine_scale(base, new):
+    """Во сколько раз машина при замере ``new`` быстрее, чем при ``base``."""
+    return base['calibration']['p50'] / new['calibration']['p50']
+
+
+def compare_results(base, new, alpha, threshold, scale=1.0):
+    """Строки сравнения двух прогонов по общим маршрутам.
+
+    Задержки ``new`` умножаются на ``scale``. Регрессия задержки —
+    p-value с поправкой Бонферрони на число маршрутов меньше ``alpha``
+    и медиана выросла больше чем на ``threshold``; регрессия запросов —
+    их стало больше.
+    """
+    common = [name for name in new['routes'] if name in base['routes']]
+    rows = []
+    for name in common:
+        previous, current = base['routes'][name], new['routes'][name]
+        samples = [sample * scale for sample in current['samples']]
+        p_value = min(
+            mann_whitney(previous['samples'], samples) * len(common), 1.0
+        )
+        new_p50 = percentile(samples, 50)
+        change = new_p50 / previous['p50'] - 1 if previous['p50'] else 0
+        problems = []
+        if p_value < alpha and change > threshold:
+            problems.append('latency')
+        if current['queries'] > previous['queries']:
+            problems.append('queries')
+        rows.append({
+            'route': name,
+            'base_p50': previous['p50'],
+            'new_p50': new_p50,
+            'change': change,
+            'p_value': p_value,
+            'base_queries': previous['queries'],
+            'new_queries': current['queries'],
+            'regressions': problems,
+        })
+    return rows
+
+
+def read_results(path):
+    try:
+        with open(path, encoding='utf-8') as result_file:
+            results = json.load(result_file)
+    except (OSError, ValueError) as error:
+        raise CommandError(f'Не удалось прочитать {path}: {error}')
+    if results.get('version') != FORMAT_VERSION:
+        raise CommandError(f'{path}: неизвестный формат результатов')
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и размер ответа для каждого '
+        'маршрута api/v1 на сгенерированных данных во временной базе '
+        'SQLite. С --compare сравнивает два сохранённых прогона.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--titles',
+            type=int,
+            default=1000,
+            help='Размер данных для generate_data.'
+        )
+        parser.add_argument(
+            '--dataset',
+            help='Каталог уже сгенерированных CSV вместо новых данных.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Сколько замеров на маршрут.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Сколько запросов на маршрут перед замерами.'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым замером.'
+        )
+        parser.add_argument(
+            '--routes',
+            help='Шаблоны имён маршрутов через запятую, например titles-*.'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark_api.json',
+            help='Файл для результатов в JSON.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Сравнить новый прогон с сохранённым.'
+        )
+        parser.add_argument(
+            '--compare',
+            nargs=2,
+            metavar=('BASE', 'NEW'),
+            help='Только сравнить два сохранённых прогона.'
+        )
+        parser.add_argument(
+            '--no-normalize',
+            dest='normalize',
+            action='store_false',
+            help='Не делать поправку на скорость машины при сравнении.'
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=0.01,
+            help='Уровень значимости для U-критерия.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.1,
+            help='Минимальный рост медианы, который считается регрессией.'
+        )
+
+    def get_routes(self):
+        """Маршруты с id из загруженных данных: самые «горячие» объекты."""
+        title = Title.objects.order_by('-review_count', 'id').first()
+        busiest = Comment.objects.values('review_id').annotate(
+            total=Count('id')
+        ).order_by('-total', 'review_id').first()
+        if title is None or busiest is None:
+            raise CommandError('В данных нет произведений с комментариями')
+        review = Review.objects.filter(title=title).order_by('id').first()
+        commented = Review.objects.get(pk=busiest['review_id'])
+        comment = commented.comments.order_by('id').first()
+        genre = Genre.objects.order_by('id').first()
+        category = Category.objects.order_by('id').first()
+        word = title.description.split()[0]
+        ids = ','.join(map(str, Title.objects.order_by('id').values_list(
+            'id', flat=True
+        )[:settings.TITLE_BATCH_LIMIT]))
+        # API листает по limit/offset: последняя страница — глубокий offset.
+        last_offset = max(
+            Title.objects.count() - settings.REST_FRAMEWORK['PAGE_SIZE'], 0
+        )
+        titles = '/api/v1/titles/'
+        reviews = f'{titles}{title.pk}/reviews/'
+        comments = (
+            f'{titles}{commented.title_id}/reviews/{commented.pk}/comments/'
+        )
+        return (
+            Route('categories-list', 'get', '/api/v1/categories/'),
+            Route(
+                'categories-search', 'get',
+                f'/api/v1/categories/?search={quote(category.name)}'
+            ),
+            Route('genres-list', 'get', '/api/v1/genres/'),
+            Route(
+                'genres-search', 'get',
+                f'/api/v1/genres/?search={quote(genre.name)}'
+            ),
+            Route('titles-list', 'get', titles),
+            Route(
+                'titles-list-last-page', 'get',
+                f'{titles}?offset={last_offset}'
+            ),
+            Route(
+                'titles-filter-genre', 'get', f'{titles}?genre={genre.slug}'
+            ),
+            Route(
+                'titles-filter-category', 'get',
+                f'{titles}?category={category.slug}'
+            ),
+            Route('titles-filter-year', 'get', f'{titles}?year={title.year}'),
+            Route(
+                'titles-filter-name', 'get',
+                f'{titles}?name={quote(title.name)}'
+            ),
+            Route('titles-search', 'get', f'{titles}?search={quote(word)}'),
+            Route('titles-fields', 'get', f'{titles}?fields=id,name,rating'),
+            Route('titles-batch', 'get', f'{titles}batch/?ids={ids}'),
+            Route('titles-detail', 'get', f'{titles}{title.pk}/'),
+            Route('reviews-list', 'get', reviews),
+            Route('reviews-detail', 'get', f'{reviews}{review.pk}/'),
+            Route('comments-list', 'get', comments),
+            Route('comments-detail', 'get', f'{comments}{comment.pk}/'),
+            Route('users-list', 'get', '/api/v1/users/', user='admin'),
+            Route(
+                'users-search', 'get', '/api/v1/users/?search=user1',
+                user='admin'
+            ),
+            Route('users-detail', 'get', '/api/v1/users/user1/', user='admin'),
+            Route('users-me', 'get', '/api/v1/users/me/', user='user'),
+            Route(
+                'cache-stats', 'get', '/api/v1/cache-stats/', user='admin'
+            ),
+            Route(
+                'export-titles-ndjson', 'get', '/api/v1/export/titles.ndjson',
+                user='admin'
+            ),
+            Route(
+                'auth-signup', 'post', '/api/v1/auth/signup/',
+                {'username': 'bench{n}', 'email': 'bench{n}@yamdb.fake'}
+            ),
+            Route(
+                'auth-token', 'post', '/api/v1/auth/token/',
+                {'username': 'bench-user', 'confirmation_code': '{code}'}
+            ),
+        )
+
+    def get_credentials(self):
+        """Токены администратора и пользователя и код подтверждения."""
+        admin = User.objects.create(
+            username='bench-admin', email='bench-admin@yamdb.fake',
+            role='admin'
+        )
+        user = User.objects.create(
+            username='bench-user', email='bench-user@yamdb.fake'
+        )
+        user.confirmation_code = default_token_generator.make_token(user)
+        user.save()
+        headers = {
+            role: f'Bearer {AccessToken.for_user(account)}'
+            for role, account in (('admin', admin), ('user', user))
+        }
+        return headers, user.confirmation_code
+
+    def request(self, client, route, number, headers, code, cold=False):
+        """Один запрос: секунды, число запросов к базе, ответ и размер."""
+        if cold:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+        extra = {}
+        if route.user:
+            extra['HTTP_AUTHORIZATION'] = headers[route.user]
+        if route.data is not None:
+            extra['data'] = json.dumps({
+                key: value.format(n=number, code=code)
+                for key, value in route.data.items()
+            })
+            extra['content_type'] = 'application/json'
+        with wrap_queries(QueryCounter()) as counter:
+            started = time.perf_counter()
+            response = getattr(client, route.method)(route.url, **extra)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = time.perf_counter() - started
+        return elapsed, counter.count, response, size
+
+    def measure(self, client, routes, options, credentials):
+        """Замеры по кругу: каждый проход запрашивает все маршруты.
+
+        Так медленный дрейф машины (нагрев, соседние процессы) делится
+        между маршрутами поровну и не выглядит регрессией одного из них.
+        """
+        numbers = count(1)
+        for route in routes:
+            for _ in range(options['warmup'] + 1):
+                _, _, response, _ = self.request(
+                    client, route, next(numbers), *credentials
+                )
+                if response.status_code >= 300:
+                    raise CommandError(
+                        f'{route.name}: {route.url} ответил '
+                        f'{response.status_code}'
+                    )
+        calibration = []
+        results = {route.name: {
+            'method': route.method.upper(),
+            'url': route.url,
+            'queries': 0,
+            'size': 0,
+            'samples': [],
+        } for route in routes}
+        for _ in range(options['requests']):
+            calibration.append(calibrate())
+            for route in routes:
+                elapsed, queries, response, size = self.request(
+                    client, route, next(numbers), *credentials,
+                    cold=options['cold']
+                )
+                result = results[route.name]
+                result['status'] = response.status_code
+                result['queries'] = max(result['queries'], queries)
+                result['size'] = max(result['size'], size)
+                result['samples'].append(elapsed * 1000)
+        for result in results.values():
+            result.update(summarize(result['samples']))
+        return results, dict(samples=calibration, **summarize(calibration))
+
+    def measure_routes(self, options):
+        """Замеры выбранных маршрутов на уже загруженных данных."""
+        credentials = self.get_credentials()
+        patterns = [
+            pattern for pattern in (options['routes'] or '*').split(',')
+            if pattern
+        ]
+        routes, calibration = self.measure(Client(), [
+            route for route in self.get_routes()
+            if any(fnmatch(route.name, item) for item in patterns)
+        ], options, credentials)
+        for name, result in routes.items():
+            self.stdout.write(
+                '{name:<24} p50 {p50:7.2f} мс  p95 {p95:7.2f} мс  '
+                'p99 {p99:7.2f} мс  запросов {queries:3}  '
+                '{size} байт'.format(name=name, **result)
+            )
+        return routes, calibration
+
+    def run(self, directory, options):
+        overrides = override_settings(
+            DEBUG=False,
+            NPLUSONE_DETECTION=False,
+            METRICS_DIR=os.path.join(directory, 'metrics'),
+            SLOW_QUERY_LOG=os.path.join(directory, 'slow_queries.jsonl'),
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            CACHES={
+                alias: dict(
+                    config, LOCATION=os.path.join(directory, 'cache', alias)
+                )
+                for alias, config in settings.CACHES.items()
+            }
+        )
+        database = os.path.join(directory, 'api.sqlite3')
+        with temporary_database(database), overrides:
+            call_command(
+                'load_data', '--path', options['dataset'] or directory,
+                '--fast', stdout=io.StringIO()
+            )
+            return self.measure_routes(options)
+
+    def compare(self, base, new, options):
+        scale = 1.0
+        if options['normalize']:
+            scale = machine_scale(base, new)
+            self.stdout.write(
+                f'Поправка на скорость машины: x{scale:.3f}'
+            )
+        rows = compare_results(
+            base, new, options['alpha'], options['threshold'], scale
+        )
+        regressions = 0
+        for row in rows:
+            flags = ', '.join(row['regressions']) or 'ok'
+            regressions += bool(row['regressions'])
+            self.stdout.write(
+                '{route:<24} p50 {base_p50:7.2f} → {new_p50:7.2f} мс '
+                '({change:+6.1%}, p={p_value:.4f})  запросов '
+                '{base_queries} → {new_queries}  {flags}'.format(
+                    flags=flags, **row
+                )
+            )
+        if regressions:
+            raise CommandError(
+                f'Регрессий: {regressions} (alpha={options["alpha"]})'
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено'))
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            base, new = map(read_results, options['compare'])
+            return self.compare(base, new, options)
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замеры доступны только для SQLite')
+        if options['requests'] < 2 or options['warmup'] < 0:
+            raise CommandError('Нужно хотя бы два замера на маршрут')
+        baseline = options['baseline'] and read_results(options['baseline'])
+        with tempfile.TemporaryDirectory() as directory:
+            if not options['dataset']:
+                call_command(
+                    'generate_data', directory,
+                    '--titles', str(options['titles']),
+                    '--seed', str(options['seed']),
+                    stdout=io.StringIO()
+                )
+            routes, calibration = self.run(directory, options)
+        results = {
+            'version': FORMAT_VERSION,
+            'created': timezone.now().isoformat(),
+            'titles': options['titles'],
+            'dataset': options['dataset'],
+            'seed': options['seed'],
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'cold': options['cold'],
+            'calibration': calibration,
+            'routes': routes,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+        if baseline:
+            self.compare(baseline, results, options)
@@ -0,0 +1,113 @@
+import csv
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+
+MODES = {
+    'default': (),
+    'fast': ('--fast',),
+}
+
+
+def count_rows(directory):
+    """Сколько строк данных во всех CSV каталога."""
+    total = 0
+    for name in os.listdir(directory):
+        if name.endswith('.csv'):
+            with open(
+                os.path.join(directory, name), encoding='utf-8', newline=''
+            ) as csv_file:
+                total += sum(1 for _ in csv.reader(csv_file)) - 1
+    return total
+
+
+@contextmanager
+def temporary_database(path):
+    """Новая база SQLite в ``path`` вместо основной на время блока."""
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    old_test_name = settings_dict['TEST'].get('NAME')
+    settings_dict['TEST']['NAME'] = path
+    try:
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict['TEST']['NAME'] = old_test_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость load_data в разных режимах: каждый режим '
+        'загружает одни и те же данные generate_data в новую базу SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reviews',
+            type=int,
+            default=100000,
+            help='Сколько отзывов сгенерировать.'
+        )
+        parser.add_argument(
+            '--modes',
+            default=','.join(MODES),
+            help=f'Режимы через запятую: {", ".join(MODES)}.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--seed', type=int, default=1)
+
+    def run_mode(self, directory, mode, options):
+        """Время загрузки в режиме ``mode`` во временную базу."""
+        with temporary_database(os.path.join(directory, f'{mode}.sqlite3')):
+            started = time.monotonic()
+            call_command(
+                'load_data',
+                '--path', directory,
+                '--batch-size', str(options['batch_size']),
+                '--workers', str(options['workers']),
+                *MODES[mode],
+                stdout=io.StringIO()
+            )
+            return time.monotonic() - started
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'benchmark_load_data требует базу SQLite: режим --fast '
+                f'работает только с ней, а текущая база — {connection.vendor}'
+            )
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Неизвестные режимы: {", ".join(unknown)}')
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'generate_data',
+                directory,
+                '--titles', str(max(options['reviews'] // 10, 1)),
+                '--reviews', str(options['reviews']),
+                '--seed', str(options['seed']),
+                '--workers', str(max(options['workers'], 1)),
+                '--force',
+                stdout=io.StringIO()
+            )
+            rows = count_rows(directory)
+            self.stdout.write(f'Сгенерировано строк: {rows}')
+            baseline = None
+            for mode in modes:
+                elapsed = self.run_mode(directory, mode, options)
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f'{mode:>8}: {elapsed:.2f} с, '
+                    f'{rows / elapsed:.0f} строк/с, '
+                    f'x{baseline / elapsed:.2f}'
+                )
@@ -0,0 +1,398 @@
+import bz2
+import csv
+import gzip
+import lzma
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+
+# Открытие файла в нужном сжатии и расширение, которое понимает load_data.
+COMPRESSORS = {
+    'none': (open, ''),
+    'gz': (gzip.open, '.gz'),
+    'bz2': (bz2.open, '.bz2'),
+    'xz': (lzma.open, '.xz'),
+}
+
+HEADERS = {
+    'users': ('id', 'username', 'email', 'role', 'bio', 'first_name',
+              'last_name'),
+    'category': ('id', 'name', 'slug'),
+    'genre': ('id', 'name', 'slug'),
+    'titles': ('id', 'name', 'year', 'category', 'description'),
+    'genre_title': ('id', 'title_id', 'genre_id'),
+    'review': ('id', 'title_id', 'text', 'author', 'score', 'pub_date'),
+    'comments': ('id', 'review_id', 'text', 'author', 'pub_date'),
+}
+
+# Размер части, которую пишет один процесс. Не зависит от числа процессов,
+# поэтому при том же seed результат одинаков при любом --workers.
+TITLES_PER_SHARD = 10000
+USERS_PER_SHARD = 100000
+
+WORDS = (
+    'фильм книга песня сюжет герой финал автор актёр роль музыка сцена '
+    'история драма смысл идея стиль образ текст жанр эпизод мир время '
+    'сильный слабый скучный яркий смешной грустный лучший новый старый '
+    'отличный неожиданный длинный короткий честный странный добрый'
+).split()
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Юлия')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов')
+
+# Показатель хвоста распределения комментариев к отзыву (Парето).
+COMMENTS_ALPHA = 2.0
+MASK64 = (1 << 64) - 1
+EPOCH_START = 1420070400  # 2015-01-01
+EPOCH_SPAN = 9 * 365 * 24 * 3600
+
+Config = namedtuple('Config', (
+    'directory', 'compress', 'seed', 'titles', 'users', 'reviews',
+    'comments_mean', 'zipf', 'harmonic', 'permutation', 'categories',
+    'genres',
+))
+
+
+def splitmix(value):
+    """Быстрый детерминированный хеш 64-битного числа (SplitMix64)."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def unit(seed, *keys):
+    """Число из [0, 1), зависящее только от seed и ключей."""
+    value = seed
+    for key in keys:
+        value = splitmix(value ^ key)
+    return value / (1 << 64)
+
+
+def harmonic(count, exponent):
+    """Обобщённое гармоническое число H(count, exponent).
+
+    Первые слагаемые суммируются точно, хвост — интегралом.
+    """
+    exact = min(count, 10000)
+    total = sum(rank ** -exponent for rank in range(1, exact + 1))
+    if count > exact:
+        low, high = exact + 0.5, count + 0.5
+        if exponent == 1:
+            total += math.log(high / low)
+        else:
+            total += (
+                high ** (1 - exponent) - low ** (1 - exponent)
+            ) / (1 - exponent)
+    return total
+
+
+def permutation(count, seed):
+    """Параметры перестановки ``rank = (a * i + b) % count`` без таблицы."""
+    step = 2654435761 % count or 1
+    while math.gcd(step, count) != 1:
+        step += 1
+    return step, seed % count
+
+
+def title_rank(config, title_id):
+    step, shift = config.permutation
+    return (step * (title_id - 1) + shift) % config.titles + 1
+
+
+def rounded(value, fraction):
+    whole = math.floor(value)
+    return whole + (fraction < value - whole)
+
+
+def review_count(config, title_id):
+    """Отзывов у произведения: закон Ципфа по рангу популярности."""
+    expected = config.reviews * title_rank(config, title_id) ** (
+        -config.zipf
+    ) / config.harmonic
+    count = rounded(expected, unit(config.seed, 1, title_id))
+    return min(count, config.users)
+
+
+def comment_count(config, title_id, index):
+    """Комментариев к отзыву: степенной хвост со средним comments_mean."""
+    if not config.comments_mean:
+        return 0
+    scale = (1 - unit(config.seed, 2, title_id, index)) ** (
+        -1 / COMMENTS_ALPHA
+    ) - 1
+    expected = config.comments_mean * (COMMENTS_ALPHA - 1) * scale
+    expected = min(expected, config.comments_mean * 1000)
+    return rounded(expected, unit(config.seed, 3, title_id, index))
+
+
+def genre_count(config, title_id):
+    return 1 + int(unit(config.seed, 4, title_id) * min(3, config.genres))
+
+
+def shard_titles(config, shard):
+    start = shard * TITLES_PER_SHARD + 1
+    return range(start, min(start + TITLES_PER_SHARD, config.titles + 1))
+
+
+def count_shard(config, shard):
+    """Сколько связей, отзывов и комментариев даст часть произведений."""
+    links = reviews = comments = 0
+    for title_id in shard_titles(config, shard):
+        links += genre_count(config, title_id)
+        count = review_count(config, title_id)
+        reviews += count
+        for index in range(count):
+            comments += comment_count(config, title_id, index)
+    return links, reviews, comments
+
+
+def open_part(config, table, shard):
+    opener, _ = COMPRESSORS[config.compress]
+    path = os.path.join(config.directory, f'{table}.{shard:06d}.part')
+    return path, opener(path, 'wt', encoding='utf-8', newline='')
+
+
+def timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+
+
+def text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def write_users(config, shard):
+    """Часть users.csv; роли: 1% модераторов, 0,1% администраторов."""
+    rng = random.Random(f'{config.seed}:users:{shard}')
+    start = shard * USERS_PER_SHARD + 1
+    path, part = open_part(config, 'users', shard)
+    with part:
+        writer = csv.writer(part)
+        for pk in range(start, min(start + USERS_PER_SHARD, config.users + 1)):
+            chance = rng.random()
+            role = (
+                'admin' if chance < 0.001
+                else 'moderator' if chance < 0.011
+                else 'user'
+            )
+            writer.writerow((
+                pk, f'user{pk}', f'user{pk}@yamdb.fake', role,
+                text(rng, 0, 8), rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES)
+            ))
+    return {'users': path}
+
+
+def write_shard(config, shard, offsets):
+    """Пишет части titles, genre_title, review и comments одной части.
+
+    ``offsets`` — последние pk связей, отзывов и комментариев перед этой
+    частью, посчитанные count_shard для предыдущих частей.
+    """
+    rng = random.Random(f'{config.seed}:titles:{shard}')
+    link_pk, review_pk, comment_pk = offsets
+    paths = {}
+    files = {}
+    for table in ('titles', 'genre_title', 'review', 'comments'):
+        paths[table], files[table] = open_part(config, table, shard)
+    writers = {table: csv.writer(part) for table, part in files.items()}
+    try:
+        for title_id in shard_titles(config, shard):
+            writers['titles'].writerow((
+                title_id, f'Произведение {title_id}',
+                rng.randint(1900, 2023), rng.randint(1, config.categories),
+                text(rng, 5, 40)
+            ))
+            for genre_id in rng.sample(
+                range(1, config.genres + 1), genre_count(config, title_id)
+            ):
+                link_pk += 1
+                writers['genre_title'].writerow((link_pk, title_id, genre_id))
+            count = review_count(config, title_id)
+            authors = rng.sample(range(1, config.users + 1), count)
+            for index, author in enumerate(authors):
+                review_pk += 1
+                published = EPOCH_START + rng.randrange(EPOCH_SPAN)
+                writers['review'].writerow((
+                    review_pk, title_id, text(rng, 3, 40), author,
+                    rng.randint(1, 10), timestamp(published)
+                ))
+                for _ in range(comment_count(config, title_id, index)):
+                    comment_pk += 1
+                    writers['comments'].writerow((
+                        comment_pk, review_pk, text(rng, 1, 30),
+                        rng.randint(1, config.users),
+                        timestamp(published + rng.randrange(30 * 86400))
+                    ))
+    finally:
+        for part in files.values():
+            part.close()
+    return paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует CSV для load_data заданного масштаба: отзывы '
+        'распределены по произведениям по закону Ципфа, данные пишутся '
+        'потоком несколькими процессами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Каталог для CSV-файлов.')
+        parser.add_argument('--titles', type=int, default=1000)
+        parser.add_argument(
+            '--reviews',
+            type=int,
+            help='Сколько отзывов, примерно; по умолчанию 10 на произведение.'
+        )
+        parser.add_argument(
+            '--comments',
+            type=float,
+            default=1.0,
+            help='Среднее число комментариев на отзыв.'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='Сколько пользователей; по умолчанию десятая часть отзывов.'
+        )
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.0,
+            help='Показатель закона Ципфа для отзывов на произведение.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--compress',
+            choices=COMPRESSORS,
+            default='none',
+            help='Сжатие файлов.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Сколько процессов генерируют данные.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перезаписать существующие файлы.'
+        )
+
+    def get_config(self, options, directory):
+        titles = options['titles']
+        reviews = options['reviews']
+        if reviews is None:
+            reviews = titles * 10
+        users = options['users'] or max(reviews // 10, 100)
+        if min(titles, users, options['categories'], options['genres']) < 1:
+            raise CommandError('Размеры таблиц должны быть положительными')
+        if reviews < 0 or options['comments'] < 0 or options['zipf'] < 0:
+            raise CommandError('Отзывы, комментарии и zipf неотрицательны')
+        return Config(
+            directory=directory,
+            compress=options['compress'],
+            seed=options['seed'],
+            titles=titles,
+            users=users,
+            reviews=reviews,
+            comments_mean=options['comments'],
+            zipf=options['zipf'],
+            harmonic=harmonic(titles, options['zipf']),
+            permutation=permutation(titles, options['seed']),
+            categories=options['categories'],
+            genres=options['genres'],
+        )
+
+    def write_small(self, config, table, rows):
+        path, part = open_part(config, table, 0)
+        with part:
+            csv.writer(part).writerows(rows)
+        return {table: path}
+
+    def assemble(self, config, path, table, parts):
+        """Склеивает заголовок и части в итоговый файл таблицы.
+
+        Сжатые части — отдельные потоки gzip/bz2/xz; их склейка читается
+        как один файл.
+        """
+        _, suffix = COMPRESSORS[config.compress]
+        target = os.path.join(path, f'{table}.csv{suffix}')
+        header, part = open_part(config, table, -1)
+        with part:
+            csv.writer(part).writerow(HEADERS[table])
+        with open(target, 'wb') as output:
+            for name in [header] + parts:
+                with open(name, 'rb') as source:
+                    shutil.copyfileobj(source, output)
+                os.remove(name)
+        return target
+
+    def handle(self, *args, **options):
+        path = options['path']
+        os.makedirs(path, exist_ok=True)
+        _, suffix = COMPRESSORS[options['compress']]
+        existing = [
+            table for table in HEADERS
+            if os.path.exists(os.path.join(path, f'{table}.csv{suffix}'))
+        ]
+        if existing and not options['force']:
+            raise CommandError(
+                f'Файлы уже существуют: {", ".join(existing)}; '
+                'используйте --force'
+            )
+        started = time.monotonic()
+        with tempfile.TemporaryDirectory(dir=path) as directory, \
+                ProcessPoolExecutor(max(options['workers'], 1)) as pool:
+            config = self.get_config(options, directory)
+            shards = range(math.ceil(config.titles / TITLES_PER_SHARD))
+            counts = list(pool.map(
+                count_shard, [config] * len(shards), shards
+            ))
+            offsets, totals = [], (0, 0, 0)
+            for count in counts:
+                offsets.append(totals)
+                totals = tuple(map(sum, zip(totals, count)))
+            user_shards = range(math.ceil(config.users / USERS_PER_SHARD))
+            results = [
+                self.write_small(config, 'category', (
+                    (pk, f'Категория {pk}', f'category-{pk}')
+                    for pk in range(1, config.categories + 1)
+                )),
+                self.write_small(config, 'genre', (
+                    (pk, f'Жанр {pk}', f'genre-{pk}')
+                    for pk in range(1, config.genres + 1)
+                )),
+            ]
+            results += pool.map(
+                write_users, [config] * len(user_shards), user_shards
+            )
+            results += pool.map(
+                write_shard, [config] * len(shards), shards, offsets
+            )
+            for table in HEADERS:
+                self.assemble(config, path, table, [
+                    result[table] for result in results if table in result
+                ])
+        elapsed = time.monotonic() - started
+        links, reviews, comments = totals
+        rows = (
+            config.users + config.categories + config.genres
+            + config.titles + links + reviews + comments
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Сгенерировано за {elapsed:.2f} с: пользователей {config.users}, '
+            f'произведений {config.titles}, связей с жанрами {links}, '
+            f'отзывов {reviews}, комментариев {comments} '
+            f'(всего {rows} строк)'
+        ))
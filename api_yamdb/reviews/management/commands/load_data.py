@@ -1,9 +1,32 @@
+import bz2
 import csv
+import gzip
+import hashlib
+import io
+import lzma
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from itertools import islice
+from queue import Empty
 
+from django.apps import apps
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError, call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
+from reviews.search import (FTS_TABLE, drop_triggers, has_fts,
+                            rebuild_index)
+from reviews.versions import AUTHOR_NAMES, bump_version, version_label
 from users.models import User
 
 TABLES = {
@@ -11,21 +34,683 @@ TABLES = {
     Category: 'category.csv',
     Genre: 'genre.csv',
     Title: 'titles.csv',
+    GenreTitle: 'genre_title.csv',
     Review: 'review.csv',
     Comment: 'comments.csv',
 }
 
+# Таблицы, которые должны быть загружены раньше данной.
+DEPENDENCIES = {
+    Title: (Category,),
+    GenreTitle: (Title, Genre),
+    Review: (Title, User),
+    Comment: (Review, User),
+}
+
+# Колонки, по которым версионируются списки: отзывы произведения и т.п.
+VERSION_SCOPES = {
+    Review: ('title', 'title_id'),
+    Comment: ('review', 'review_id'),
+}
+
+# Сигнатуры сжатых потоков и функции, которые их открывают.
+COMPRESSED = (
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+)
+SUFFIXES = ('', '.gz', '.bz2', '.xz')
+
+# Сколько разобранных пачек таблицы может ждать записи.
+QUEUE_SIZE = 4
+# Настройки SQLite на время первичной загрузки в режиме --fast: без fsync,
+# журнал отката и временные данные в памяти, большой кеш страниц.
+FAST_PRAGMAS = (
+    ('synchronous', 'OFF'),
+    ('journal_mode', 'MEMORY'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', '-262144'),
+)
+# Значения этих типов нужно приводить к виду, который хранит база.
+ADAPTED_TYPES = ('DateField', 'DateTimeField', 'DecimalField', 'TimeField')
+# Не больше переменных в одном IN, чем допускают старые сборки SQLite.
+QUERY_CHUNK_SIZE = 500
+
+
+def open_csv(path):
+    """Текстовый поток CSV из файла или stdin (``-``), сжатого или нет.
+
+    Сжатие определяется по первым байтам, а не по расширению, поэтому
+    так же читается сжатый поток со stdin.
+    """
+    try:
+        raw = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    except OSError as error:
+        raise CommandError(f'Не удалось открыть {path}: {error}')
+    if not hasattr(raw, 'peek'):
+        raw = io.BufferedReader(raw)
+    head = raw.peek(6)
+    for magic, decompress in COMPRESSED:
+        if head.startswith(magic):
+            raw = decompress(raw)
+            break
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def find_file(directory, name):
+    """Файл таблицы в каталоге: ``name`` или его сжатый вариант."""
+    for suffix in SUFFIXES:
+        path = os.path.join(directory, name + suffix)
+        if os.path.exists(path):
+            return path
+    raise CommandError(f'Не найден файл {name} в {directory}')
+
+
+def import_order(models):
+    """Модели в порядке зависимостей, при равенстве — в порядке TABLES."""
+    pending = [model for model in TABLES if model in models]
+    ordered = []
+    while pending:
+        model = next(
+            model for model in pending
+            if all(
+                dependency in ordered or dependency not in pending
+                for dependency in DEPENDENCIES.get(model, ())
+            )
+        )
+        pending.remove(model)
+        ordered.append(model)
+    return ordered
+
+
+def column_map(model, header):
+    """Колонки CSV в поля модели: ``author`` -> поле ``author_id``."""
+    fields = {}
+    for field in model._meta.concrete_fields:
+        fields[field.name] = fields[field.attname] = field
+    unknown = [column for column in header if column not in fields]
+    if unknown:
+        raise CommandError(
+            f'{model.__name__}: неизвестные колонки {", ".join(unknown)}'
+        )
+    return [fields[column] for column in header]
+
+
+def parse_value(field, value):
+    if value == '' and field.null:
+        return None
+    value = field.to_python(value)
+    if (
+        isinstance(value, datetime)
+        and settings.USE_TZ
+        and timezone.is_naive(value)
+    ):
+        value = timezone.make_aware(value)
+    return value
+
+
+def row_hash(row):
+    """Хеш содержимого строки; даты сравниваются в UTC."""
+    return hashlib.md5(repr(tuple(
+        value.astimezone(timezone.utc).isoformat()
+        if isinstance(value, datetime) and timezone.is_aware(value)
+        else value
+        for value in row
+    )).encode()).digest()
+
+
+def parse_table(label, path, batch_size, hashes=False):
+    """Разбирает и проверяет CSV, выдавая сообщения для записи.
+
+    Сначала ``('columns', attnames)``, затем ``('rows', (batch, hashes))``
+    с кортежами уже приведённых значений и в конце ``('done', None)``.
+    Хеши строк считаются только по запросу, для режима синхронизации.
+    """
+    model = apps.get_model(label)
+    with open_csv(path) as csv_file:
+        reader = csv.reader(csv_file)
+        fields = column_map(model, next(reader, []))
+        yield 'columns', [field.attname for field in fields]
+        while True:
+            batch = []
+            for row in islice(reader, batch_size):
+                try:
+                    batch.append(tuple(
+                        parse_value(field, value)
+                        for field, value in zip(fields, row)
+                    ))
+                except ValidationError as error:
+                    raise CommandError(
+                        f'{os.path.basename(path)}, строка '
+                        f'{reader.line_num}: {"; ".join(error.messages)}'
+                    )
+            if not batch:
+                break
+            yield 'rows', (
+                batch, [row_hash(row) for row in batch] if hashes else None
+            )
+    yield 'done', None
+
+
+def parse_worker(queue, *args):
+    """Процесс-разборщик: отправляет сообщения parse_table в очередь."""
+    try:
+        for message in parse_table(*args):
+            queue.put(message)
+    except Exception as error:
+        queue.put(('error', str(error)))
+
+
+def missing_pks(model, seen, batch_size):
+    """pk из базы, которых нет в отсортированном массиве ``seen``."""
+    index = 0
+    last_pk = None
+    while True:
+        queryset = model.objects.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        chunk = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1]
+        missing = []
+        for pk in chunk:
+            while index < len(seen) and seen[index] < pk:
+                index += 1
+            if index == len(seen) or seen[index] != pk:
+                missing.append(pk)
+        if missing:
+            yield missing
+
+
+@contextmanager
+def fast_pragmas(using):
+    """Включает FAST_PRAGMAS и возвращает прежние значения по выходе."""
+    previous = []
+    with using.cursor() as cursor:
+        for name, value in FAST_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}')
+            previous.append((name, cursor.fetchone()[0]))
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with using.cursor() as cursor:
+            for name, value in previous:
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def drop_indexes(model, using):
+    """Удаляет неуникальные индексы таблицы и возвращает SQL для них.
+
+    Уникальные индексы остаются: без них загрузка не заметит дубликатов.
+    """
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = %s AND sql IS NOT NULL",
+            [model._meta.db_table]
+        )
+        indexes = [
+            (name, sql) for name, sql in cursor.fetchall()
+            if not sql.upper().startswith('CREATE UNIQUE')
+        ]
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {using.ops.quote_name(name)}')
+    return [sql for _, sql in indexes]
+
+
+class RawInserter:
+    """Вставка пачек одним подготовленным INSERT через executemany.
+
+    Обходит создание объектов модели: значения из CSV приводятся к виду
+    базы, недостающие колонки заполняются значениями по умолчанию.
+    """
+
+    def __init__(self, model, attnames, using):
+        self.using = using
+        fields = [model._meta.get_field(name) for name in attnames]
+        self.converters = [
+            (lambda value, field=field: field.get_db_prep_save(value, using))
+            if field.get_internal_type() in ADAPTED_TYPES else None
+            for field in fields
+        ]
+        now = timezone.now()
+        missing = [
+            field for field in model._meta.concrete_fields
+            if field.attname not in attnames and not field.primary_key
+        ]
+        self.defaults = tuple(
+            field.get_db_prep_save(
+                now if getattr(field, 'auto_now', False)
+                or getattr(field, 'auto_now_add', False)
+                else field.get_default(),
+                using
+            )
+            for field in missing
+        )
+        columns = [field.column for field in fields + missing]
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            using.ops.quote_name(model._meta.db_table),
+            ', '.join(using.ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+
+    def insert(self, batch):
+        converters = self.converters
+        with self.using.cursor() as cursor:
+            cursor.executemany(self.sql, [
+                tuple(
+                    convert(value) if convert else value
+                    for convert, value in zip(converters, row)
+                ) + self.defaults
+                for row in batch
+            ])
+
+
+@contextmanager
+def keep_dates(fields):
+    """Не даёт ``auto_now_add`` затереть даты, пришедшие из CSV."""
+    patched = [
+        field for field in fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in patched:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in patched:
+            field.auto_now_add = True
+
+
+def worker_context():
+    """Контекст fork для разборщиков или None, если fork недоступен.
+
+    Под spawn, который по умолчанию на macOS и Windows, дочерний процесс
+    импортирует этот модуль с моделями до настройки Django. Без fork
+    таблицы разбираются на месте.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+class Parser:
+    """Разбор одной таблицы: в отдельном процессе или на месте."""
+
+    def __init__(self, model, path, batch_size, hashes, context=None):
+        self.args = (model._meta.label, path, batch_size, hashes)
+        self.process = None
+        if context is not None:
+            self.queue = context.Queue(QUEUE_SIZE)
+            self.process = context.Process(
+                target=parse_worker,
+                args=(self.queue,) + self.args,
+                daemon=True
+            )
+
+    def start(self):
+        if self.process is not None:
+            self.process.start()
+
+    def messages(self):
+        if self.process is None:
+            yield from parse_table(*self.args)
+            return
+        while True:
+            try:
+                kind, data = self.queue.get(timeout=1)
+            except Empty:
+                if not self.process.is_alive():
+                    raise CommandError(
+                        f'Разбор {self.args[1]} прервался без результата'
+                    )
+                continue
+            if kind == 'error':
+                raise CommandError(data)
+            yield kind, data
+            if kind == 'done':
+                break
+        self.process.join()
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        for model, csv_f in TABLES.items():
-            with open(
-                f'{settings.BASE_DIR}/static/data/{csv_f}',
-                'r',
-                encoding='utf-8'
-            ) as csv_file:
-                reader = csv.DictReader(csv_file)
-                model.objects.bulk_create(
-                    model(**data) for data in reader
+    help = (
+        'Загружает данные из CSV в порядке зависимостей таблиц: файлы '
+        'разбираются параллельно, записывает один процесс, по транзакции '
+        'на таблицу. Файлы могут быть сжаты gzip, bz2 или xz.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'static', 'data'),
+            help='Каталог с CSV-файлами.'
+        )
+        parser.add_argument(
+            '--table',
+            action='append',
+            default=[],
+            metavar='NAME[=FILE]',
+            help=(
+                'Загрузить только эту таблицу (users, titles, ...), '
+                'при необходимости из FILE; "-" — читать stdin.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять за один запрос.'
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help=(
+                'Сверить строки с базой по pk и хешу содержимого: '
+                'добавить новые и обновить изменившиеся.'
+            )
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Вместе с --sync удалить строки, которых нет в файлах.'
+        )
+        parser.add_argument(
+            '--fast',
+            action='store_true',
+            help=(
+                'Первичная загрузка в SQLite: PRAGMA для массовой записи, '
+                'неуникальные индексы перестраиваются после таблицы, '
+                'вставка через executemany.'
+            )
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help=(
+                'Сколько файлов разбирать параллельно; '
+                '0 — разбирать в процессе записи.'
+            )
+        )
+
+    def get_sources(self, options):
+        names = {
+            os.path.splitext(csv_f)[0]: model
+            for model, csv_f in TABLES.items()
+        }
+        selected = {}
+        for value in options['table']:
+            name, _, path = value.partition('=')
+            if name not in names:
+                raise CommandError(
+                    f'Неизвестная таблица {name}, '
+                    f'доступны: {", ".join(names)}'
                 )
-        self.stdout.write(self.style.SUCCESS('Все данные загружены'))
+            selected[names[name]] = path
+        if list(selected.values()).count('-') > 1:
+            raise CommandError('Со stdin можно загрузить только одну таблицу')
+        return [
+            (model, selected.get(model) or find_file(
+                options['path'], TABLES[model]
+            ))
+            for model in import_order(selected or TABLES)
+        ]
+
+    def get_parsers(self, sources, batch_size, workers):
+        context = worker_context() if workers > 0 else None
+        if context is not None:
+            # Разборщикам не нужна база: соединение не должно уйти в fork.
+            if not connection.in_atomic_block:
+                connection.close()
+        return [
+            Parser(
+                model,
+                path,
+                batch_size,
+                self.sync,
+                context if path != '-' else None
+            )
+            for model, path in sources
+        ]
+
+    def insert_batch(self, model, attnames, batch, stats):
+        if self.inserter is not None:
+            self.inserter.insert(batch)
+            stats['inserted'] += len(batch)
+            return
+        # Без batch_size: Django 2.2 не урезает явный размер до предела
+        # SQLite в 500 слагаемых составного SELECT и падает на больших
+        # пачках, а сам делит пачку по этому пределу.
+        model.objects.bulk_create(
+            [model(**dict(zip(attnames, row))) for row in batch]
+        )
+        stats['inserted'] += len(batch)
+
+    def sync_batch(self, model, attnames, batch, hashes, stats):
+        """Вставляет новые и обновляет изменившиеся строки пачки.
+
+        Существующие строки читаются одним запросом по pk и сравниваются
+        с входящими по хешу содержимого, так что неизменённые строки
+        не пишутся. Возвращает pk строк пачки.
+        """
+        pk_index = attnames.index(model._meta.pk.attname)
+        pks = [row[pk_index] for row in batch]
+        existing = {}
+        for start in range(0, len(pks), QUERY_CHUNK_SIZE):
+            for row in model.objects.filter(
+                pk__in=pks[start:start + QUERY_CHUNK_SIZE]
+            ).values_list(*attnames):
+                existing[row[pk_index]] = row
+        created, changed = [], []
+        for row, digest in zip(batch, hashes):
+            old = existing.get(row[pk_index])
+            if old is None:
+                created.append(row)
+            elif row_hash(old) != digest:
+                changed.append(row)
+                self.track_changes(model, attnames, old)
+        if created:
+            self.insert_batch(model, attnames, created, stats)
+        if changed:
+            update_fields = [
+                name for name in attnames if name != model._meta.pk.attname
+            ]
+            extra = {}
+            if 'modified' not in attnames and any(
+                field.name == 'modified' for field in model._meta.fields
+            ):
+                update_fields.append('modified')
+                extra['modified'] = timezone.now()
+            model.objects.bulk_update(
+                [
+                    model(**dict(zip(attnames, row)), **extra)
+                    for row in changed
+                ],
+                update_fields
+            )
+            stats['updated'] += len(changed)
+        for row in created + changed:
+            self.track_changes(model, attnames, row)
+        stats['unchanged'] += len(batch) - len(created) - len(changed)
+        return pks
+
+    def track_changes(self, model, attnames, row):
+        """Запоминает метки версий и произведения для пересчёта рейтинга.
+
+        Массовые запросы не вызывают сигналов, поэтому метки отдельных
+        объектов и списков (например, отзывов произведения) сдвигаются
+        здесь.
+        """
+        values = dict(zip(attnames, row))
+        pk = values[model._meta.pk.attname]
+        self.labels.add(version_label(model, pk=pk))
+        scope, column = VERSION_SCOPES.get(model, (None, None))
+        if column in values:
+            self.labels.add(version_label(model, **{scope: values[column]}))
+        if model is Review and values.get('title_id') is not None:
+            self.rating_titles.add(values['title_id'])
+
+    def delete_missing(self, model, seen, batch_size, stats):
+        """Удаляет строки, которых не было во входных данных."""
+        if any(a > b for a, b in zip(seen, islice(seen, 1, None))):
+            seen = array('q', sorted(seen))
+        for missing in missing_pks(model, seen, batch_size):
+            model.objects.filter(pk__in=missing).delete()
+            stats['deleted'] += len(missing)
+
+    @contextmanager
+    def fast_table(self, model, attnames):
+        """В режиме --fast снимает индексы таблицы на время её загрузки.
+
+        Неуникальные индексы и триггеры полнотекстового индекса удаляются
+        и строятся заново после вставки. DDL в SQLite транзакционен,
+        поэтому при откате таблицы индексы вернутся вместе с ним.
+        """
+        self.inserter = None
+        if not self.fast:
+            yield
+            return
+        indexes = drop_indexes(model, connection)
+        search_index = model is Title and (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+        if search_index:
+            drop_triggers(connection)
+        self.inserter = RawInserter(model, attnames, connection)
+        yield
+        self.inserter = None
+        with connection.cursor() as cursor:
+            for sql in indexes:
+                cursor.execute(sql)
+        if search_index:
+            rebuild_index(connection)
+
+    def version_labels(self, sources):
+        """Метки версий, которые сдвигает загрузка."""
+        labels = [model for model, _ in sources] + list(self.labels)
+        if User in labels:
+            # Загрузка может сменить имена авторов отзывов и комментариев.
+            labels.append(AUTHOR_NAMES)
+        return labels
+
+    def write_table(self, model, messages, batch_size):
+        """Записывает пачки одной таблицы в одной транзакции."""
+        started = time.monotonic()
+        stats = dict.fromkeys(
+            ('inserted', 'updated', 'unchanged', 'deleted'), 0
+        )
+        seen = array('q')
+        with transaction.atomic():
+            _, attnames = next(messages)
+            if self.sync and model._meta.pk.attname not in attnames:
+                raise CommandError(
+                    f'{model.__name__}: для синхронизации нужна колонка '
+                    f'{model._meta.pk.attname}'
+                )
+            fields = [model._meta.get_field(name) for name in attnames]
+            with keep_dates(fields), self.fast_table(model, attnames):
+                for kind, data in messages:
+                    if kind != 'rows':
+                        break
+                    batch, hashes = data
+                    if self.sync:
+                        pks = self.sync_batch(
+                            model, attnames, batch, hashes, stats
+                        )
+                        if self.delete:
+                            seen.extend(pks)
+                    else:
+                        self.insert_batch(model, attnames, batch, stats)
+                    if self.verbosity > 1:
+                        self.stdout.write(f'  {model.__name__}: {stats}')
+                if self.delete:
+                    self.delete_missing(model, seen, batch_size, stats)
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [model]
+                ):
+                    cursor.execute(sql)
+        elapsed = time.monotonic() - started
+        count = stats['inserted'] + stats['updated'] + stats['unchanged']
+        details = ''
+        if self.sync:
+            details = (
+                f' (добавлено {stats["inserted"]}, '
+                f'изменено {stats["updated"]}, '
+                f'без изменений {stats["unchanged"]}, '
+                f'удалено {stats["deleted"]})'
+            )
+        self.stdout.write(
+            f'{model._meta.db_table}: {count} строк{details} '
+            f'за {elapsed:.2f} с '
+            f'({count / elapsed if elapsed else count:.0f} строк/с)'
+        )
+        return count
+
+    def check_options(self, batch_size):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        if self.delete and not self.sync:
+            raise CommandError('--delete работает только вместе с --sync')
+        if self.fast and not has_fts(connection):
+            raise CommandError(
+                '--fast требует базу SQLite (PRAGMA и индекс FTS5), '
+                f'а текущая база — {connection.vendor}'
+            )
+        if self.fast and self.sync:
+            raise CommandError(
+                '--fast предназначен для первичной загрузки '
+                'и не сочетается с --sync'
+            )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.sync = options['sync']
+        self.delete = options['delete']
+        self.fast = options['fast']
+        self.labels = set()
+        self.rating_titles = set()
+        batch_size = options['batch_size']
+        self.check_options(batch_size)
+        sources = self.get_sources(options)
+        parsers = self.get_parsers(
+            sources, batch_size, max(options['workers'], 0)
+        )
+        workers = max(options['workers'], 1)
+        started = time.monotonic()
+        total = 0
+        pragmas = fast_pragmas(connection) if self.fast else nullcontext()
+        try:
+            for parser in parsers[:workers]:
+                parser.start()
+            with pragmas:
+                for index, (model, _) in enumerate(sources):
+                    total += self.write_table(
+                        model, parsers[index].messages(), batch_size
+                    )
+                    if index + workers < len(parsers):
+                        parsers[index + workers].start()
+        finally:
+            for parser in parsers:
+                parser.stop()
+        elapsed = time.monotonic() - started
+        bump_version(*self.version_labels(sources))
+        if not self.sync:
+            call_command('recount_ratings', stdout=self.stdout)
+        elif self.rating_titles:
+            call_command(
+                'recount_ratings',
+                titles=sorted(self.rating_titles),
+                stdout=self.stdout
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Все данные загружены: {total} строк за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from reviews.models import Title
+from reviews.search import has_fts, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс произведений.'
+
+    def handle(self, *args, **options):
+        if not has_fts():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite')
+        rebuild_index(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен: {Title.objects.count()} произведений'
+        ))
@@ -0,0 +1,98 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from reviews.models import Review, Title
+from reviews.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает и сверяет сохранённые рейтинги произведений.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько произведений обрабатывать за один проход.'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить значения, ничего не записывая.'
+        )
+        parser.add_argument(
+            '--titles',
+            type=int,
+            nargs='+',
+            metavar='ID',
+            help='Пересчитать только эти произведения.'
+        )
+
+    def get_chunks(self, chunk_size, title_ids=None):
+        """Произведения с сохранёнными итогами пачками по возрастанию pk."""
+        columns = ('pk', 'score_sum', 'review_count')
+        if title_ids is not None:
+            title_ids = sorted(set(title_ids))
+            for start in range(0, len(title_ids), chunk_size):
+                chunk = list(
+                    Title.objects.filter(
+                        pk__in=title_ids[start:start + chunk_size]
+                    ).order_by('pk').values_list(*columns)
+                )
+                if chunk:
+                    yield chunk
+            return
+        last_pk = 0
+        while True:
+            chunk = list(
+                Title.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list(*columns)[:chunk_size]
+            )
+            if not chunk:
+                return
+            last_pk = chunk[-1][0]
+            yield chunk
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+        checked = mismatched = 0
+        for chunk in self.get_chunks(chunk_size, options['titles']):
+            totals = {
+                title_id: (total, count)
+                for title_id, total, count in Review.objects.filter(
+                    title_id__in=[pk for pk, _, _ in chunk]
+                ).order_by().values('title_id').annotate(
+                    total=Sum('score'),
+                    count=Count('pk')
+                ).values_list('title_id', 'total', 'count')
+            }
+            stale = [
+                (pk, *totals.get(pk, (0, 0)))
+                for pk, score_sum, review_count in chunk
+                if totals.get(pk, (0, 0)) != (score_sum, review_count)
+            ]
+            checked += len(chunk)
+            mismatched += len(stale)
+            if options['check'] or not stale:
+                continue
+            with transaction.atomic():
+                for pk, total, count in stale:
+                    Title.objects.filter(pk=pk).update(
+                        score_sum=total,
+                        review_count=count,
+                        modified=timezone.now()
+                    )
+        if mismatched and not options['check']:
+            bump_version(Title, Review)
+        message = (
+            f'Проверено произведений: {checked}, '
+            f'расхождений: {mismatched}'
+        )
+        if options['check'] and mismatched:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,121 @@
+import glob
+import json
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+ORDERS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['worst']['duration_ms'],
+    'mean': lambda group: group['total_ms'] / group['count'],
+}
+
+
+def log_files(path, backups):
+    """Журналы всех процессов и их ротированные копии, от старых к новым."""
+    root, ext = os.path.splitext(path)
+    names = []
+    for name in sorted(glob.glob(f'{glob.escape(root)}.*{glob.escape(ext)}')):
+        names.extend(f'{name}.{index}' for index in range(backups, 0, -1))
+        names.append(name)
+    return [name for name in names if os.path.exists(name)]
+
+
+def read_records(paths):
+    """Записи журналов и число строк, которые не удалось разобрать."""
+    records, broken = [], 0
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        broken += 1
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+    return records, broken
+
+
+def group_records(records):
+    """Статистика по отпечаткам запросов."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'],
+            'count': 0,
+            'total_ms': 0.0,
+            'routes': Counter(),
+            'worst': record,
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['routes'][record.get('route') or '-'] += 1
+        if record['duration_ms'] > group['worst']['duration_ms']:
+            group['worst'] = record
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных SQL-запросов: худшие отпечатки запросов '
+        'с маршрутами, параметрами и планом самого долгого выполнения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help=(
+                'Файлы журнала; по умолчанию журналы всех процессов '
+                'по SLOW_QUERY_LOG с копиями.'
+            )
+        )
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--order',
+            choices=ORDERS,
+            default='total',
+            help='Порядок: суммарное время, число, максимум или среднее.'
+        )
+
+    def write_group(self, number, group):
+        worst = group['worst']
+        routes = ', '.join(
+            f'{route} ×{count}'
+            for route, count in group['routes'].most_common(3)
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{number}. всего {group["total_ms"]:.1f} мс, '
+            f'{group["count"]} раз, '
+            f'среднее {group["total_ms"] / group["count"]:.1f} мс, '
+            f'максимум {worst["duration_ms"]:.1f} мс'
+        ))
+        self.stdout.write(f'   маршруты: {routes}')
+        self.stdout.write(f'   SQL: {group["fingerprint"]}')
+        self.stdout.write(f'   параметры худшего: {worst.get("params")}')
+        for line in worst.get('plan') or ():
+            self.stdout.write(f'   план: {line}')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or log_files(
+            settings.SLOW_QUERY_LOG, settings.SLOW_QUERY_LOG_BACKUPS
+        )
+        if not paths:
+            raise CommandError('Журнал медленных запросов пуст')
+        records, broken = read_records(paths)
+        if broken:
+            self.stderr.write(f'Пропущено повреждённых строк: {broken}')
+        groups = sorted(
+            group_records(records), key=ORDERS[options['order']],
+            reverse=True
+        )
+        self.stdout.write(
+            f'Медленных запросов: {len(records)}, '
+            f'разных отпечатков: {len(groups)}'
+        )
+        for number, group in enumerate(groups[:options['top']], 1):
+            self.write_group(number, group)
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_totals(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    totals = Title.objects.annotate(
+        total=Sum('reviews__score'),
+        count=Count('reviews')
+    ).values_list('pk', 'total', 'count')
+    for pk, total, count in list(totals):
+        Title.objects.filter(pk=pk).update(
+            score_sum=total or 0,
+            review_count=count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -23,6 +23,10 @@ class Genre(models.Model):
             message='Вы используете недопустимые символы'
         )]
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Жанр'
@@ -49,6 +53,10 @@ class Category(models.Model):
             message='Вы используете недопустимые символы'
         )]
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Категория'
@@ -96,6 +104,20 @@ class Title(models.Model):
         verbose_name='Категория произведения',
         null=True
     )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+        editable=False
+    )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Произведение'
@@ -107,10 +129,23 @@ class Title(models.Model):
                 name='unique_year_title'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=['category', '-year', 'name'],
+                name='title_category_year_idx'
+            ),
+        )
 
     def __str__(self):
         return tw.shorten(self.name, width=15, placeholder='...')
 
+    @property
+    def rating(self):
+        "Средняя оценка по сохранённым сумме и количеству отзывов."
+        if not self.review_count:
+            return None
+        return self.score_sum / self.review_count
+
 
 class GenreTitle(models.Model):
     "Модель связи жанра и произведения."
@@ -129,6 +164,12 @@ class GenreTitle(models.Model):
         verbose_name = 'Связь жанра и произведения'
         verbose_name_plural = 'Связи жанров и произведений'
         ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=['genre', 'title'],
+                name='genretitle_genre_title_idx'
+            ),
+        )
 
     def __str__(self):
         return f'Произведению {self.title} соответствует жанр {self.genre}'
@@ -167,6 +208,10 @@ class Review(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         ordering = ('-pub_date',)
@@ -178,6 +223,12 @@ class Review(models.Model):
                 name='unique_author_title'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['title', '-pub_date', '-id'],
+                name='review_title_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return tw.shorten(self.text, width=15, placeholder='...')
@@ -206,11 +257,21 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['review', '-pub_date', '-id'],
+                name='comment_review_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return tw.shorten(self.text, width=15, placeholder='...')
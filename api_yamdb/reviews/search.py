@@ -0,0 +1,105 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'reviews_title_fts'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, content='reviews_title', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai "
+    "AFTER INSERT ON reviews_title BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad "
+    "AFTER DELETE ON reviews_title BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    "AFTER UPDATE OF name, description ON reviews_title BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+)
+
+DROP_SQL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def has_fts(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """Запрос FTS5 из пользовательской строки: слова как префиксы через И."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_titles(queryset, text):
+    """Произведения, найденные по названию и описанию, от лучших к худшим."""
+    expression = match_expression(text)
+    if not expression:
+        return queryset.none()
+    if not has_fts():
+        words = re.findall(r'\w+', text)
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(name__icontains=word) | Q(description__icontains=word)
+            )
+        return queryset.filter(condition)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = reviews_title.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+        order_by=['search_rank', 'reviews_title.id'],
+    )
+
+
+def ensure_index(using=connection):
+    """Восстанавливает триггеры индекса, если сам индекс создан.
+
+    SQLite пересоздаёт reviews_title при изменении схемы и теряет триггеры,
+    поэтому это выполняется после каждой миграции.
+    """
+    if not has_fts(using) or (
+        FTS_TABLE not in using.introspection.table_names()
+    ):
+        return
+    with using.cursor() as cursor:
+        for sql in CREATE_SQL[1:]:
+            cursor.execute(sql)
+
+
+def drop_triggers(using=connection):
+    """Отключает обновление индекса на время массовой загрузки.
+
+    После загрузки индекс нужно восстановить через rebuild_index.
+    """
+    with using.cursor() as cursor:
+        for sql in DROP_SQL[:3]:
+            cursor.execute(sql)
+
+
+def rebuild_index(using=connection):
+    """Полностью перестраивает индекс по содержимому reviews_title."""
+    with using.cursor() as cursor:
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
@@ -0,0 +1,107 @@
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title)
+from reviews.versions import (AUTHOR_NAMES, bump_version_on_commit,
+                              version_label)
+from users.models import User
+
+VERSIONED_MODELS = (Category, Comment, Genre, GenreTitle, Review, Title, User)
+
+
+def change_rating(title_id, score, count):
+    "Атомарно сдвигает сумму оценок и количество отзывов произведения."
+    if title_id is None:
+        return
+    Title.objects.filter(pk=title_id).update(
+        score_sum=F('score_sum') + score,
+        review_count=F('review_count') + count,
+        modified=timezone.now()
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_score(sender, instance, **kwargs):
+    "Запоминает прежние произведение и оценку редактируемого отзыва."
+    instance._previous_score = None
+    if instance.pk is not None:
+        instance._previous_score = Review.objects.filter(
+            pk=instance.pk
+        ).values_list('title_id', 'score').first()
+
+
+@receiver(post_save, sender=Review)
+def add_review_score(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_score', None)
+    if previous is not None and previous[0] != instance.title_id:
+        bump_version_on_commit(version_label(Review, title=previous[0]))
+    if created or previous is None:
+        change_rating(instance.title_id, instance.score, 1)
+        return
+    title_id, score = previous
+    if (title_id, score) == (instance.title_id, instance.score):
+        return
+    change_rating(title_id, -score, -1)
+    change_rating(instance.title_id, instance.score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_score(sender, instance, **kwargs):
+    change_rating(instance.title_id, -instance.score, -1)
+
+
+def bump_model_version(sender, instance, **kwargs):
+    bump_version_on_commit(sender, version_label(sender, pk=instance.pk))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, **kwargs):
+    "Запоминает прежнее имя редактируемого пользователя."
+    instance._previous_username = None
+    if instance.pk is not None:
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def bump_author_names_version(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_username', None)
+    if previous is not None and previous != instance.username:
+        bump_version_on_commit(AUTHOR_NAMES)
+
+
+@receiver(post_delete, sender=User)
+def bump_deleted_author_version(sender, instance, **kwargs):
+    bump_version_on_commit(AUTHOR_NAMES)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_genre_title_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version_on_commit(GenreTitle)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_title_reviews_version(sender, instance, **kwargs):
+    bump_version_on_commit(version_label(Review, title=instance.title_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_review_comments_version(sender, instance, **kwargs):
+    bump_version_on_commit(
+        version_label(Comment, review=instance.review_id)
+    )
@@ -0,0 +1,79 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'data-version:{}'
+# Отдельный кеш: версии не вытесняются вместе с ответами и count.
+VERSION_CACHE = 'versions'
+
+
+def version_label(model, **scope):
+    """Метка версии модели или её части, например отзывов одного произведения.
+
+    ``version_label(Review, title=42)`` -> ``'reviews.review:title=42'``.
+    """
+    label = model if isinstance(model, str) else model._meta.label_lower
+    if scope:
+        label += ':' + ','.join(
+            f'{key}={value}' for key, value in sorted(scope.items())
+        )
+    return label
+
+
+# Имена авторов в списках отзывов и комментариев. Метка сдвигается только
+# при смене или удалении имени, а не при любой записи пользователя.
+AUTHOR_NAMES = version_label('users.user', field='username')
+
+
+def now_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(*labels):
+    """Текущие версии данных в общем кеше.
+
+    Версия — время последней записи в миллисекундах, поэтому по ней же
+    считается Last-Modified. Отсутствующая версия заводится от текущего
+    времени, чтобы после вытеснения из кеша не совпасть со старыми ключами.
+    """
+    cache = caches[VERSION_CACHE]
+    keys = [VERSION_KEY.format(version_label(label)) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, now_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(*labels):
+    """Сдвигает версии данных после записи.
+
+    Новое значение даёт атомарный incr, поэтому одновременные сдвиги
+    одной метки не сливаются в одну версию. Затем версия догоняет
+    текущее время, чтобы служить Last-Modified: если это присваивание
+    перекроет чужой incr, обе записи уже зафиксированы до него.
+    """
+    cache = caches[VERSION_CACHE]
+    now = now_version()
+    for label in labels:
+        key = VERSION_KEY.format(version_label(label))
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            if cache.add(key, now, timeout=None):
+                continue
+            version = cache.incr(key)
+        if version < now:
+            cache.set(key, now, timeout=None)
+
+
+def bump_version_on_commit(*labels):
+    """Сдвигает версии после фиксации текущей транзакции.
+
+    Сдвиг до фиксации дал бы другому процессу прочитать новую версию
+    вместе со старыми строками и закешировать их под новым ключом. Вне
+    транзакции версии сдвигаются сразу.
+    """
+    transaction.on_commit(lambda: bump_version(*labels))
@@ -113,3 +113,61 @@ def create_comments(admin_client, admin):
     result.append({'id': create_comment(client_moderator, titles[0]["id"], reviews[0]["id"], 'qwerty321'),
                    'author': moderator.username, 'text': 'qwerty321'})
     return result, reviews, titles, user, moderator
+
+
+def count_queries(client, url):
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+
+    # Из кеша готовых ответов список отдаётся вовсе без запросов.
+    with override_settings(RESPONSE_CACHE=False):
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+    )
+    return len(context.captured_queries)
+
+
+def bulk_create_titles(count):
+    from reviews.models import Category, Genre, GenreTitle, Title
+
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name='Драма', slug='drama'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=2000, category=category)
+        for i in range(count)
+    )
+    titles = Title.objects.order_by('pk')
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title=title, genre=genre)
+        for title in titles for genre in genres
+    )
+    return list(titles)
+
+
+def bulk_create_reviews(title, count):
+    from django.contrib.auth import get_user_model
+    from reviews.models import Comment, Review
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(username=f'reader{i}', email=f'reader{i}@yamdb.fake')
+        for i in range(count)
+    )
+    authors = list(User.objects.filter(username__startswith='reader'))
+    Review.objects.bulk_create(
+        Review(title=title, author=author, text='Отзыв', score=5)
+        for author in authors
+    )
+    review = Review.objects.filter(title=title).first()
+    Comment.objects.bulk_create(
+        Comment(review=review, author=author, text='Комментарий')
+        for author in authors
+    )
+    return review
@@ -33,4 +33,8 @@ assert get_version() < '3.0.0', 'Пожалуйста, используйте в
 
 pytest_plugins = [
     'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_cache',
+    'tests.fixtures.fixture_nplusone',
+    'tests.fixtures.fixture_metrics',
+    'tests.fixtures.fixture_slowlog',
 ]
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings, tmp_path):
+    """Файлы метрик каждого теста — в его временном каталоге."""
+    settings.METRICS_DIR = str(tmp_path / 'metrics')
+    return settings.METRICS_DIR
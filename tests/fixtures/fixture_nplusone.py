@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def nplusone(settings):
+    """Каждый запрос к API в тестах падает на однотипных повторах SQL."""
+    settings.NPLUSONE_DETECTION = True
+    settings.NPLUSONE_RAISE = True
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def slow_query_log(settings, tmp_path):
+    """Журнал медленных запросов каждого теста — в его временном каталоге.
+
+    Возвращает файл текущего процесса.
+    """
+    from api_yamdb.slowlog import process_log_path
+
+    settings.SLOW_QUERY_LOG = str(tmp_path / 'logs' / 'slow_queries.jsonl')
+    return process_log_path(settings.SLOW_QUERY_LOG, os.getpid())
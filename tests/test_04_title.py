@@ -249,3 +249,200 @@ class Test04TitleAPI:
         user, moderator = create_users_api(admin_client)
         self.check_permissions(user, 'обычного пользователя', titles, categories, genres)
         self.check_permissions(moderator, 'модератора', titles, categories, genres)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_titles_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?search=пике')
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [titles[0]['id']], (
+            'Проверьте, что при GET запросе `/api/v1/titles/?search=` ищется по описанию'
+        )
+        response = client.get('/api/v1/titles/?search=проек')
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [titles[1]['id']], (
+            'Проверьте, что при GET запросе `/api/v1/titles/?search=` ищется по началу слова в названии'
+        )
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Замысел'})
+        response = client.get('/api/v1/titles/?search=проект')
+        assert response.json()['count'] == 0, (
+            'Проверьте, что поисковый индекс обновляется при изменении произведения'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        response = client.get('/api/v1/titles/?search="пике')
+        assert response.status_code == 200 and response.json()['count'] == 0, (
+            'Проверьте, что поисковый индекс обновляется при удалении произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_titles_slug_filters(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+
+        def ids(url):
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+            )
+            return sorted(title['id'] for title in response.json()['results'])
+
+        both = sorted(title['id'] for title in titles)
+        assert ids('/api/v1/titles/?genre=horror,drama') == both, (
+            'Проверьте, что `genre` принимает список slug и ищет любой из жанров'
+        )
+        assert ids('/api/v1/titles/?genre=horror,comedy&genre_mode=all') == [titles[0]['id']], (
+            'Проверьте, что при `genre_mode=all` нужны все перечисленные жанры'
+        )
+        assert ids('/api/v1/titles/?genre=horror,drama&genre_mode=all') == [], (
+            'Проверьте, что при `genre_mode=all` нужны все перечисленные жанры'
+        )
+        assert ids('/api/v1/titles/?genre=dram') == [], (
+            'Проверьте, что по умолчанию `genre` сравнивается точно'
+        )
+        assert ids('/api/v1/titles/?genre=dram&genre_mode=contains') == [titles[1]['id']], (
+            'Проверьте, что при `genre_mode=contains` ищется подстрока slug'
+        )
+        assert ids('/api/v1/titles/?category=films,books') == both
+        assert ids('/api/v1/titles/?category=film&category_mode=contains') == [titles[0]['id']]
+        response = client.get('/api/v1/titles/?genre=drama&genre_mode=some')
+        assert response.status_code == 400, (
+            'Проверьте, что при неизвестном `genre_mode` возвращается статус 400'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_titles_taxonomy_cache(self, client, admin_client):
+        from reviews.models import Genre
+
+        titles, _, _ = create_titles(admin_client)
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert response.json()['genre'] == [{'name': 'Драма', 'slug': 'drama'}]
+        genre = Genre.objects.get(slug='drama')
+        genre.name = 'Трагедия'
+        genre.save()
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert response.json()['genre'] == [{'name': 'Трагедия', 'slug': 'drama'}], (
+            'Проверьте, что кеш справочников сбрасывается при изменении жанра'
+        )
+        response = client.get('/api/v1/genres/')
+        assert {'name': 'Трагедия', 'slug': 'drama'} in response.json()['results'], (
+            'Проверьте, что список жанров отдаётся из актуального кеша'
+        )
+        admin_client.post('/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'})
+        response = admin_client.patch(
+            f'/api/v1/titles/{titles[1]["id"]}/', data={'genre': ['western']}
+        )
+        assert response.status_code == 200 and response.json()['genre'] == [
+            {'name': 'Вестерн', 'slug': 'western'}
+        ], (
+            'Проверьте, что новый жанр сразу доступен при записи произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_titles_sparse_fields(self, client, admin_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/?fields=id,name,rating'
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url + '&limit=5')
+        data = response.json()['results']
+        assert all(list(title) == ['id', 'name', 'rating'] for title in data), (
+            'Проверьте, что `?fields=` оставляет только запрошенные поля'
+        )
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        assert 'description' not in sql and 'reviews_genretitle' not in sql, (
+            'Проверьте, что при `?fields=` не выбираются лишние колонки и жанры'
+        )
+        response = client.get(f'/api/v1/titles/?fields=name,genre,category&name={titles[0]["name"]}')
+        title = response.json()['results'][0]
+        assert title == {
+            'name': titles[0]['name'],
+            'genre': ['comedy', 'horror'],
+            'category': titles[0]['category'],
+        }, (
+            'Проверьте, что нераскрытые связи отдаются slug'
+        )
+        response = client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/?fields=name,category&expand=category'
+        )
+        assert response.json() == {'name': titles[1]['name'], 'category': categories[1]}, (
+            'Проверьте, что `?expand=` раскрывает связь и на странице объекта'
+        )
+        response = client.get(f'/api/v1/titles/{titles[1]["id"]}/?fields=genre')
+        assert response.json() == {'genre': titles[1]['genre']}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_titles_batch(self, client, admin_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        titles, _, _ = create_titles(admin_client)
+        ids = [titles[1]['id'], 999, titles[0]['id']]
+        url = '/api/v1/titles/batch/?ids=' + ','.join(map(str, ids))
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200, (
+            'Проверьте, что GET запрос `/api/v1/titles/batch/?ids=` возвращает статус 200'
+        )
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [titles[1]['id'], titles[0]['id']], (
+            'Проверьте, что `/api/v1/titles/batch/` сохраняет порядок запрошенных id'
+        )
+        assert data['missing'] == [999], (
+            'Проверьте, что `/api/v1/titles/batch/` перечисляет ненайденные id в `missing`'
+        )
+        single = client.get(f'/api/v1/titles/{titles[0]["id"]}/').json()
+        assert data['results'][1] == single
+        assert len(context.captured_queries) <= 2, (
+            'Проверьте, что `/api/v1/titles/batch/` выполняет не больше двух запросов'
+        )
+        assert client.get('/api/v1/titles/batch/?ids=1,x').status_code == 400
+        too_many = ','.join(str(pk) for pk in range(1, 102))
+        assert client.get(f'/api/v1/titles/batch/?ids={too_many}').status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_titles_bulk(self, client, user_client, admin_client):
+        import json
+
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/bulk/'
+        items = [
+            {'name': 'Новое', 'year': 2001, 'genre': [genres[0]['slug'], genres[0]['slug']],
+             'category': categories[0]['slug'], 'description': 'Первое'},
+            {'name': 'Поворот туда', 'year': 2000, 'genre': [], 'category': categories[0]['slug']},
+            {'name': 'Ещё', 'year': 2002, 'genre': ['unknown'], 'category': categories[0]['slug']},
+            {'id': titles[1]['id'], 'name': 'Проект 2', 'year': 2021, 'genre': [genres[1]['slug']],
+             'category': categories[0]['slug']},
+            {'id': 999, 'name': 'Нет', 'year': 2003, 'genre': [], 'category': categories[0]['slug']},
+            {'name': 'Новое', 'year': 2001, 'genre': [], 'category': categories[0]['slug']},
+        ]
+        body = json.dumps(items)
+        assert client.post(url, data=body, content_type='application/json').status_code == 401
+        assert user_client.post(url, data=body, content_type='application/json').status_code == 403, (
+            'Проверьте, что `/api/v1/titles/bulk/` доступен только администратору'
+        )
+        response = admin_client.post(url, data=body, content_type='application/json')
+        assert response.status_code == 200, (
+            'Проверьте, что POST запрос `/api/v1/titles/bulk/` возвращает статус 200'
+        )
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [
+            'created', 'error', 'error', 'updated', 'error', 'error'
+        ], 'Проверьте, что `/api/v1/titles/bulk/` возвращает статус для каждого элемента'
+        assert 'genre' in results[2]['errors']
+        assert 'id' in results[4]['errors']
+        created = client.get(f'/api/v1/titles/{results[0]["id"]}/').json()
+        assert created['name'] == 'Новое'
+        assert [genre['slug'] for genre in created['genre']] == [genres[0]['slug']], (
+            'Проверьте, что `/api/v1/titles/bulk/` создаёт связи с жанрами'
+        )
+        updated = client.get(f'/api/v1/titles/{titles[1]["id"]}/').json()
+        assert updated['name'] == 'Проект 2' and updated['year'] == 2021
+        assert [genre['slug'] for genre in updated['genre']] == [genres[1]['slug']], (
+            'Проверьте, что `/api/v1/titles/bulk/` заменяет жанры обновлённого произведения'
+        )
+        assert client.get('/api/v1/titles/').json()['count'] == 3
+        response = admin_client.post(url, data=json.dumps({'items': []}), content_type='application/json')
+        assert response.status_code == 400
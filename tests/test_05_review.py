@@ -334,3 +334,19 @@ class Test05ReviewAPI:
             'без токена авторизации возвращается статус 401'
         )
         self.check_permissions(user, 'обычного пользователя', reviews, titles)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_review_sparse_fields(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        response = client.get(url + '?fields=author,score')
+        data = response.json()['results']
+        assert sorted((review['author'], review['score']) for review in data) == sorted(
+            (review['author'], review['score']) for review in reviews
+        ) and all(list(review) == ['author', 'score'] for review in data), (
+            'Проверьте, что `?fields=` работает для списка отзывов'
+        )
+        response = client.get(f'{url}{reviews[0]["id"]}/?fields=text')
+        assert response.json() == {'text': reviews[0]['text']}
+        response = client.get(url + '?fields=id&pagination=cursor&limit=1')
+        assert response.json()['next'] is not None
@@ -0,0 +1,52 @@
+import pytest
+
+from .common import bulk_create_reviews, bulk_create_titles, count_queries
+
+
+class Test08QueryBudget:
+    page_sizes = (1, 10, 100)
+
+    def check_constant(self, client, url):
+        counts = {
+            limit: count_queries(client, f'{url}?limit={limit}')
+            for limit in self.page_sizes
+        }
+        assert len(set(counts.values())) == 1, (
+            f'Проверьте, что количество SQL запросов при GET запросе `{url}` '
+            f'не зависит от размера страницы: {counts}'
+        )
+        return counts[self.page_sizes[0]]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_list(self, client):
+        bulk_create_titles(max(self.page_sizes))
+        queries = self.check_constant(client, '/api/v1/titles/')
+        assert queries <= 3, (
+            'Проверьте, что список `/api/v1/titles/` отдаётся за три запроса: '
+            f'count, страница с категориями и жанры. Сейчас {queries}'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_list(self, client):
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, max(self.page_sizes))
+        queries = self.check_constant(
+            client, f'/api/v1/titles/{title.id}/reviews/'
+        )
+        assert queries <= 3, (
+            'Проверьте, что список отзывов отдаётся за три запроса: '
+            f'произведение, count и страница с авторами. Сейчас {queries}'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_comments_list(self, client):
+        title = bulk_create_titles(1)[0]
+        review = bulk_create_reviews(title, max(self.page_sizes))
+        queries = self.check_constant(
+            client,
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        )
+        assert queries <= 3, (
+            'Проверьте, что список комментариев отдаётся за три запроса: '
+            f'отзыв, count и страница с авторами. Сейчас {queries}'
+        )
@@ -0,0 +1,124 @@
+import pytest
+
+from .common import bulk_create_reviews, bulk_create_titles
+
+
+class Test09KeysetPagination:
+
+    def walk(self, client, url):
+        seen = []
+        pages = 0
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+            )
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что в keyset-режиме не считается `count`'
+            )
+            seen.extend(data['results'])
+            url = data['next']
+            pages += 1
+        return seen, pages, data
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_reviews_cursor(self, client):
+        from django.utils import timezone
+        from reviews.models import Review
+
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, 25)
+        Review.objects.update(pub_date=timezone.now())
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        seen, pages, last = self.walk(client, f'{url}?pagination=cursor&limit=10')
+        ids = [review['id'] for review in seen]
+        assert pages == 3 and len(ids) == 25 and len(set(ids)) == 25, (
+            'Проверьте, что keyset-пагинация отзывов обходит все записи '
+            'без повторов даже при совпадающем `pub_date`'
+        )
+        assert ids == sorted(ids, reverse=True), (
+            'Проверьте, что при равном `pub_date` отзывы упорядочены по `id`'
+        )
+        response = client.get(last['previous'])
+        previous = [review['id'] for review in response.json()['results']]
+        assert previous == ids[10:20], (
+            'Проверьте, что ссылка `previous` возвращает предыдущую страницу'
+        )
+        response = client.get(f'{url}?limit=10&offset=20')
+        data = response.json()
+        assert data['count'] == 25 and len(data['results']) == 5, (
+            'Проверьте, что limit/offset пагинация работает по-прежнему'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_invalid_cursor(self, client):
+        title = bulk_create_titles(1)[0]
+        response = client.get(f'/api/v1/titles/{title.id}/reviews/?cursor=xyz')
+        assert response.status_code == 404, (
+            'Проверьте, что при неверном курсоре возвращается статус 404'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_users_cursor(self, admin_client, admin):
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, 12)
+        seen, pages, _ = self.walk(
+            admin_client, '/api/v1/users/?pagination=cursor&limit=5'
+        )
+        usernames = [user['username'] for user in seen]
+        assert usernames == sorted(usernames) and len(usernames) == 13, (
+            'Проверьте, что keyset-пагинация пользователей идёт по `username`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_cached_count(self, client, admin_client):
+        bulk_create_titles(15)
+        url = '/api/v1/titles/?genre=drama&limit=5'
+        assert client.get(url).json()['count'] == 15
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Новое', 'year': 2001, 'genre': ['drama'],
+            'category': 'films'
+        })
+        assert response.status_code == 201
+        assert client.get(url).json()['count'] == 16, (
+            'Проверьте, что кеш `count` сбрасывается при записи произведений'
+        )
+        response = admin_client.delete('/api/v1/genres/drama/')
+        assert response.status_code == 204
+        assert client.get(url).json()['count'] == 0, (
+            'Проверьте, что кеш `count` сбрасывается при удалении жанра'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_count_modes(self, client):
+        bulk_create_titles(15)
+        data = client.get('/api/v1/titles/?count=none&limit=10').json()
+        assert data['count'] is None and len(data['results']) == 10, (
+            'Проверьте, что при `count=none` количество не считается'
+        )
+        assert data['next'] is not None, (
+            'Проверьте, что при `count=none` ссылка `next` есть, '
+            'пока записи не закончились'
+        )
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 5 and data['next'] is None
+        data = client.get('/api/v1/titles/?count=estimate&limit=10').json()
+        assert data['count'] == 15, (
+            'Проверьте, что при `count=estimate` небольшое количество точное'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_count_estimate_large(self, client, monkeypatch):
+        from api.v1.pagination import CachedCountPagination
+        from reviews.models import Title
+
+        monkeypatch.setattr(CachedCountPagination, 'estimate_limit', 5)
+        titles = bulk_create_titles(40)
+        Title.objects.filter(pk__in=[title.pk for title in titles[1::2]]).update(year=1999)
+        data = client.get('/api/v1/titles/?year=1999&count=estimate&limit=2').json()
+        assert data['count'] == 20, (
+            'Проверьте, что при `count=estimate` большое количество '
+            'оценивается, а не обрезается до предела'
+        )
+        assert len(data['results']) == 2 and data['next'] is not None
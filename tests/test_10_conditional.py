@@ -0,0 +1,246 @@
+import pytest
+
+from .common import create_reviews
+
+
+def second_passed(monkeypatch):
+    """Часы API на секунду впереди: секунда Last-Modified уже прошла."""
+    from api.v1 import mixins
+    from reviews.versions import now_version
+
+    monkeypatch.setattr(mixins, 'now_version', lambda: now_version() + 1000)
+
+
+class Test10ConditionalGet:
+
+    def check_not_modified(self, client, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.get('ETag')
+        assert etag and etag.startswith('"'), (
+            f'Проверьте, что при GET запросе `{url}` возвращается сильный ETag'
+        )
+        assert response.has_header('Last-Modified'), (
+            f'Проверьте, что при GET запросе `{url}` возвращается Last-Modified'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            f'Проверьте, что при GET запросе `{url}` с совпадающим '
+            '`If-None-Match` возвращается статус 304'
+        )
+        assert len(context.captured_queries) <= 1, (
+            'Проверьте, что ответ 304 отдаётся до выборки и сериализации'
+        )
+        return etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_collections(self, client, admin_client, admin, monkeypatch):
+        second_passed(monkeypatch)
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        urls = (
+            '/api/v1/titles/',
+            '/api/v1/genres/',
+            '/api/v1/categories/',
+            f'/api/v1/titles/{title_id}/reviews/',
+            f'/api/v1/titles/{title_id}/',
+            f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/',
+        )
+        etags = {url: self.check_not_modified(client, url) for url in urls}
+        admin_client.patch(
+            f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/',
+            data={'score': 10}
+        )
+        changed = {
+            url for url in urls
+            if client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code == 200
+        }
+        assert changed == {
+            '/api/v1/titles/',
+            f'/api/v1/titles/{title_id}/reviews/',
+            f'/api/v1/titles/{title_id}/',
+            f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/',
+        }, (
+            'Проверьте, что изменение отзыва меняет ETag отзыва, списка отзывов '
+            'и произведения (рейтинг), но не справочников'
+        )
+        response = client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/reviews/',
+        )
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_if_modified_since(self, client, admin_client, monkeypatch):
+        from django.core.cache import caches
+        from django.utils.http import http_date
+        from api.v1 import mixins
+        from reviews.models import Genre
+        from reviews.versions import (VERSION_CACHE, VERSION_KEY, get_versions,
+                                      now_version)
+
+        second_passed(monkeypatch)
+        admin_client.post('/api/v1/genres/', data={'name': 'Драма', 'slug': 'drama'})
+        response = client.get('/api/v1/genres/')
+        last_modified = response['Last-Modified']
+        response = client.get('/api/v1/genres/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304, (
+            'Проверьте, что при `If-Modified-Since` без изменений возвращается 304'
+        )
+        Genre.objects.filter(slug='drama').delete()
+        response = client.get(
+            '/api/v1/genres/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert response.status_code == 200 and response.json()['results'] == []
+
+        get_versions(Genre)
+        version_key = VERSION_KEY.format('reviews.genre')
+        second = now_version() // 1000 + 10000
+        caches[VERSION_CACHE].set(version_key, second * 1000 - 500)
+        monkeypatch.setattr(mixins, 'now_version', lambda: second * 1000 - 400)
+        response = client.get('/api/v1/genres/')
+        assert not response.has_header('Last-Modified'), (
+            'Проверьте, что Last-Modified не отдаётся, пока его секунда не прошла'
+        )
+        caches[VERSION_CACHE].set(version_key, second * 1000 - 300)
+        response = client.get('/api/v1/genres/', HTTP_IF_MODIFIED_SINCE=http_date(second))
+        assert response.status_code == 200, (
+            'Проверьте, что запись в ту же секунду не даёт устаревший 304 '
+            'по `If-Modified-Since`'
+        )
+        monkeypatch.setattr(mixins, 'now_version', lambda: second * 1000 + 100)
+        response = client.get('/api/v1/genres/')
+        assert response['Last-Modified'] == http_date(second), (
+            'Проверьте, что Last-Modified округляется вверх до секунды'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_response_cache(self, client, admin_client, admin):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        first = client.get('/api/v1/genres/').content
+        client.get(reviews_url)
+        before = admin_client.get('/api/v1/cache-stats/').json()
+        with CaptureQueriesContext(connection) as context:
+            assert client.get('/api/v1/genres/').content == first
+        assert len(context.captured_queries) == 0, (
+            'Проверьте, что повторный список жанров отдаётся из кеша ответов'
+        )
+        admin_client.delete(f'{reviews_url}{reviews[0]["id"]}/')
+        client.get('/api/v1/genres/')
+        response = client.get(reviews_url)
+        assert response.json()['count'] == len(reviews) - 1, (
+            'Проверьте, что кеш списка отзывов сбрасывается при удалении отзыва'
+        )
+        after = admin_client.get('/api/v1/cache-stats/').json()
+        assert after['response_hits'] - before.get('response_hits', 0) == 2, (
+            'Проверьте, что удаление отзыва не сбрасывает кеш списка жанров'
+        )
+        assert after['response_misses'] - before['response_misses'] == 1
+        response = client.get('/api/v1/cache-stats/')
+        assert response.status_code == 401
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_response_cache_host(self, client, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/?limit=1'
+        first = client.get(url, HTTP_HOST='a.example')
+        assert first.json()['next'].startswith('http://a.example/')
+        response = client.get(url, HTTP_HOST='b.example')
+        assert response.json()['next'].startswith('http://b.example/'), (
+            'Проверьте, что кеш ответов и ETag учитывают хост: в ответе '
+            'абсолютные ссылки на страницы'
+        )
+        assert response['ETag'] != first['ETag']
+        response = client.get(url, HTTP_HOST='a.example', secure=True)
+        assert response.json()['next'].startswith('https://a.example/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_author_names(self, client, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        etag = client.get(url)['ETag']
+        response = client.post(
+            '/api/v1/auth/signup/',
+            data={'email': 'new@yamdb.fake', 'username': 'newcomer'}
+        )
+        assert response.status_code == 200
+        admin_client.patch(f'/api/v1/users/{user.username}/', data={'bio': 'Био'})
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304, (
+            'Проверьте, что регистрация и правка пользователя без смены '
+            '`username` не сбрасывают кеш списка отзывов'
+        )
+        admin_client.patch(f'/api/v1/users/{user.username}/', data={'username': 'renamed'})
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что смена `username` автора сбрасывает кеш списка отзывов'
+        )
+        assert 'renamed' in {review['author'] for review in response.json()['results']}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_versions_on_commit(self):
+        from django.db import transaction
+        from reviews.models import Category, Genre
+        from reviews.versions import get_versions, version_label
+
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        labels = (Genre, Category, version_label(Genre, pk=genre.pk))
+        before = get_versions(*labels)
+        with transaction.atomic():
+            Category.objects.create(name='Фильм', slug='films')
+            genre.name = 'Комедия'
+            genre.save()
+            assert get_versions(*labels) == before, (
+                'Проверьте, что версии данных сдвигаются только после '
+                'фиксации транзакции'
+            )
+        after = get_versions(*labels)
+        assert all(new > old for new, old in zip(after, before)), (
+            'Проверьте, что версии данных сдвигаются после фиксации транзакции'
+        )
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Genre.objects.create(name='Ужасы', slug='horror')
+                raise RuntimeError
+        assert get_versions(*labels) == after, (
+            'Проверьте, что откат транзакции не сдвигает версии'
+        )
+
+    def test_07_version_cache(self):
+        import threading
+
+        from django.core.cache import caches
+        from reviews.versions import VERSION_CACHE, bump_version, get_versions
+
+        versions = get_versions('reviews.genre', 'reviews.category')
+        caches['default'].clear()
+        assert get_versions('reviews.genre', 'reviews.category') == versions, (
+            'Проверьте, что версии данных хранятся отдельно от кеша ответов'
+        )
+        cache = caches[VERSION_CACHE]
+        cache.add('counter', 0)
+
+        def increment():
+            for _ in range(25):
+                caches[VERSION_CACHE].incr('counter')
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.get('counter') == 200, (
+            'Проверьте, что incr в кеше версий атомарен'
+        )
+        before, = get_versions('reviews.genre')
+        bump_version('reviews.genre')
+        bump_version('reviews.genre')
+        after, = get_versions('reviews.genre')
+        assert after >= before + 2
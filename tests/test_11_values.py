@@ -0,0 +1,52 @@
+import pytest
+
+from .common import create_comments
+
+
+class Test11ValuesSerializers:
+
+    def responses(self, client, url, view, monkeypatch):
+        from django.core.cache import cache
+
+        fast = client.get(url)
+        cache.clear()
+        monkeypatch.setattr(view, 'values_serializer_class', None)
+        slow = client.get(url)
+        monkeypatch.undo()
+        cache.clear()
+        assert fast.status_code == slow.status_code == 200
+        return fast.content, slow.content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_same_bytes(self, client, admin_client, admin, monkeypatch):
+        from api.v1.views import CommentViewSet, ReviewViewSet, TitleViewSet
+        from reviews.models import Title
+
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        Title.objects.create(name='Без жанра', year=1999)
+        title_id = titles[0]['id']
+        urls = (
+            ('/api/v1/titles/', TitleViewSet),
+            ('/api/v1/titles/?limit=2&offset=1', TitleViewSet),
+            ('/api/v1/titles/?genre=comedy,drama', TitleViewSet),
+            ('/api/v1/titles/?search=пике', TitleViewSet),
+            ('/api/v1/titles/?count=none', TitleViewSet),
+            (f'/api/v1/titles/{title_id}/reviews/', ReviewViewSet),
+            (f'/api/v1/titles/{title_id}/reviews/?pagination=cursor&limit=2', ReviewViewSet),
+            (f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/comments/', CommentViewSet),
+        )
+        for url, view in urls:
+            fast, slow = self.responses(client, url, view, monkeypatch)
+            assert fast == slow, (
+                f'Проверьте, что быстрый сериализатор для `{url}` отдаёт '
+                'побайтно тот же ответ, что и ModelSerializer'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_rating(self, client, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        data = client.get('/api/v1/titles/').json()['results']
+        rating = {title['id']: title['rating'] for title in data}
+        assert rating[titles[0]['id']] == 4 and rating[titles[1]['id']] is None, (
+            'Проверьте, что быстрый сериализатор считает `rating` как целое среднее'
+        )
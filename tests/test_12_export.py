@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+
+import pytest
+
+from .common import create_comments
+
+
+def read(response):
+    return b''.join(response.streaming_content).decode()
+
+
+class Test12Export:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_export_access(self, client, user_client):
+        url = '/api/v1/export/titles.ndjson'
+        assert client.get(url).status_code == 401, (
+            f'Проверьте, что `{url}` недоступен без токена'
+        )
+        assert user_client.get(url).status_code == 403, (
+            f'Проверьте, что `{url}` доступен только администратору'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_export_ndjson(self, client, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        response = admin_client.get('/api/v1/export/titles.ndjson')
+        assert response.status_code == 200
+        assert response.streaming, 'Проверьте, что выгрузка отдаётся потоком'
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        rows = [json.loads(line) for line in read(response).splitlines()]
+        listed = client.get('/api/v1/titles/').json()['results']
+        assert sorted(rows, key=lambda row: row['id']) == sorted(listed, key=lambda row: row['id']), (
+            'Проверьте, что выгрузка произведений совпадает со списком `/api/v1/titles/`'
+        )
+        rows = [
+            json.loads(line)
+            for line in read(admin_client.get('/api/v1/export/reviews.ndjson')).splitlines()
+        ]
+        assert [row['id'] for row in rows] == sorted(review['id'] for review in reviews)
+        assert {row['title'] for row in rows} == {titles[0]['id']}
+        rows = [
+            json.loads(line)
+            for line in read(admin_client.get('/api/v1/export/comments.ndjson')).splitlines()
+        ]
+        assert [row['id'] for row in rows] == sorted(comment['id'] for comment in comments)
+        assert {row['review'] for row in rows} == {reviews[0]['id']}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_export_csv_since(self, admin_client, admin):
+        from reviews.models import Review
+
+        _, reviews, _, _, _ = create_comments(admin_client, admin)
+        Review.objects.filter(pk=reviews[0]['id']).update(pub_date='2001-01-01T00:00Z')
+        response = admin_client.get('/api/v1/export/reviews.csv', HTTP_ACCEPT='text/csv')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/csv')
+        rows = list(csv.DictReader(io.StringIO(read(response))))
+        assert len(rows) == len(reviews)
+        assert set(rows[0]) == {'id', 'text', 'author', 'score', 'pub_date', 'title'}
+        response = admin_client.get('/api/v1/export/reviews.csv?since=2010-01-01T00:00Z')
+        rows = list(csv.DictReader(io.StringIO(read(response))))
+        assert reviews[0]['id'] not in [int(row['id']) for row in rows], (
+            'Проверьте, что `since` отбрасывает более старые отзывы'
+        )
+        assert len(rows) == len(reviews) - 1
+        response = admin_client.get('/api/v1/export/genres.csv')
+        assert response.status_code == 404
+        response = admin_client.get('/api/v1/export/reviews.csv?since=вчера')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_export_titles_csv(self, admin_client, admin):
+        from reviews.models import Title
+
+        create_comments(admin_client, admin)
+        response = admin_client.get('/api/v1/export/titles.csv')
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(read(response))))
+        assert len(rows) == Title.objects.count()
+        assert set(rows[0]) == {
+            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+        }
+        for row in rows:
+            title = Title.objects.get(pk=row['id'])
+            assert row['category'] == title.category.slug, (
+                'Проверьте, что в CSV категория выгружается слагом'
+            )
+            assert sorted(row['genre'].split(',')) == sorted(
+                title.genre.values_list('slug', flat=True)
+            ), 'Проверьте, что в CSV жанры выгружаются слагами через запятую'
@@ -0,0 +1,232 @@
+import gzip
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+
+class Test13LoadData:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('workers', ('0', '2'))
+    def test_01_load_data(self, workers):
+        from reviews.models import Comment, GenreTitle, Review, Title
+
+        out = io.StringIO()
+        call_command('load_data', '--batch-size', '10', '--workers', workers, stdout=out)
+        assert Title.objects.count() == 32
+        assert GenreTitle.objects.count() == 42, (
+            'Проверьте, что `load_data` загружает связи жанров и произведений'
+        )
+        assert out.getvalue().index('reviews_title:') < out.getvalue().index('reviews_genretitle:'), (
+            'Проверьте, что таблицы загружаются в порядке зависимостей'
+        )
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert 'строк/с' in out.getvalue(), (
+            'Проверьте, что `load_data` сообщает скорость загрузки'
+        )
+        title = Title.objects.get(pk=1)
+        assert title.category_id == 1, (
+            'Проверьте, что колонка `category` загружается в `category_id`'
+        )
+        assert title.review_count == Review.objects.filter(title=title).count(), (
+            'Проверьте, что после загрузки рейтинги пересчитаны'
+        )
+        review = Review.objects.get(pk=1)
+        assert review.pub_date.year == 2019, (
+            'Проверьте, что `load_data` сохраняет `pub_date` из CSV'
+        )
+        assert Comment.objects.get(pk=1).author_id == 102
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_load_data_compressed(self, tmp_path):
+        from reviews.models import Category
+
+        path = tmp_path / 'category.csv.gz'
+        with gzip.open(path, 'wt', encoding='utf-8') as csv_file:
+            csv_file.write('id,name,slug\n1,Фильм,movie\n2,Книга,book\n')
+        call_command('load_data', '--table', f'category={path}', stdout=io.StringIO())
+        assert list(Category.objects.values_list('slug', flat=True)) == ['book', 'movie']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_load_data_rollback(self, tmp_path):
+        from reviews.models import Category
+
+        path = tmp_path / 'category.csv'
+        path.write_text('id,name,slug\n1,Фильм,movie\n2,Книга,movie\n', encoding='utf-8')
+        with pytest.raises(Exception):
+            call_command('load_data', '--table', f'category={path}', '--batch-size', '1',
+                         stdout=io.StringIO())
+        assert not Category.objects.exists(), (
+            'Проверьте, что таблица загружается в одной транзакции'
+        )
+        path.write_text('id,title\n1,Фильм\n', encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command('load_data', '--table', f'category={path}', stdout=io.StringIO())
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('workers', ('0', '1'))
+    def test_04_load_data_invalid_row(self, tmp_path, workers):
+        from reviews.models import Genre
+
+        path = tmp_path / 'genre.csv'
+        path.write_text('id,name,slug\n1,Драма,drama\nx,Комедия,comedy\n', encoding='utf-8')
+        with pytest.raises(CommandError, match='строка 3'):
+            call_command('load_data', '--table', f'genre={path}', '--workers', workers,
+                         stdout=io.StringIO())
+        assert not Genre.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_load_data_sync(self, tmp_path, client):
+        from reviews.models import Review, Title
+
+        call_command('load_data', '--workers', '0', stdout=io.StringIO())
+        with pytest.raises(Exception):
+            call_command('load_data', '--table', 'review', '--workers', '0', stdout=io.StringIO())
+        url = '/api/v1/titles/1/reviews/'
+        etag = client.get(url)['ETag']
+        review = Review.objects.filter(title_id=1).order_by('id').first()
+        source = tmp_path / 'review.csv'
+        lines = [
+            'id,title_id,text,author,score,pub_date',
+            f'{review.pk},1,Новый текст,{review.author_id},1,2019-09-24T21:08:21.567Z',
+            '9999,1,Свежий отзыв,102,10,2021-01-01T00:00:00Z',
+        ]
+        source.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        out = io.StringIO()
+        call_command('load_data', '--sync', '--delete', '--table', f'review={source}',
+                     '--workers', '1', stdout=out)
+        assert 'добавлено 1, изменено 1, без изменений 0, удалено 71' in out.getvalue(), (
+            'Проверьте, что `load_data --sync --delete` добавляет, обновляет и удаляет строки'
+        )
+        assert set(Review.objects.values_list('pk', flat=True)) == {review.pk, 9999}
+        assert Review.objects.get(pk=review.pk).text == 'Новый текст'
+        title = Title.objects.get(pk=1)
+        assert (title.score_sum, title.review_count) == (11, 2), (
+            'Проверьте, что после синхронизации рейтинг пересчитан'
+        )
+        assert client.get(url)['ETag'] != etag, (
+            'Проверьте, что синхронизация сбрасывает кеш списков отзывов'
+        )
+        out = io.StringIO()
+        call_command('load_data', '--sync', '--table', f'review={source}', '--workers', '0',
+                     stdout=out)
+        assert 'добавлено 0, изменено 0, без изменений 2' in out.getvalue(), (
+            'Проверьте, что неизменённые строки не перезаписываются'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_load_data_fast(self, client):
+        from django.db import connection
+        from reviews.models import Review, Title
+
+        def schema():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY name"
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        before = schema()
+        call_command('load_data', '--fast', '--workers', '0', stdout=io.StringIO())
+        assert schema() == before, (
+            'Проверьте, что `load_data --fast` восстанавливает индексы и триггеры'
+        )
+        assert Title.objects.count() == 32
+        assert Review.objects.get(pk=1).pub_date.year == 2019
+        assert Title.objects.get(pk=1).review_count == Review.objects.filter(title_id=1).count()
+        response = client.get('/api/v1/titles/?search=Шоушенка')
+        assert [title['id'] for title in response.json()['results']] == [1], (
+            'Проверьте, что после `load_data --fast` работает поиск по произведениям'
+        )
+        with pytest.raises(CommandError):
+            call_command('load_data', '--fast', '--sync', stdout=io.StringIO())
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_generate_data(self, tmp_path):
+        from reviews.models import Comment, Review, Title
+
+        options = ('--titles', '30', '--reviews', '200', '--users', '50', '--seed', '7')
+        call_command('generate_data', str(tmp_path / 'one'), *options, '--workers', '1',
+                     stdout=io.StringIO())
+        call_command('generate_data', str(tmp_path / 'two'), *options, '--workers', '2',
+                     '--compress', 'none', stdout=io.StringIO())
+        for name in ('titles.csv', 'review.csv', 'comments.csv'):
+            assert (tmp_path / 'one' / name).read_bytes() == (tmp_path / 'two' / name).read_bytes(), (
+                'Проверьте, что при одном seed `generate_data` выдаёт одинаковые '
+                'данные при любом числе процессов'
+            )
+        call_command('load_data', '--path', str(tmp_path / 'one'), '--workers', '0',
+                     stdout=io.StringIO())
+        assert Title.objects.count() == 30
+        assert 180 <= Review.objects.count() <= 220, (
+            'Проверьте, что `generate_data` создаёт примерно `--reviews` отзывов'
+        )
+        counts = sorted(
+            Title.objects.values_list('review_count', flat=True), reverse=True
+        )
+        assert counts[0] > 3 * counts[len(counts) // 2], (
+            'Проверьте, что отзывы распределены по произведениям неравномерно'
+        )
+        assert Comment.objects.count() > 0
+        with pytest.raises(CommandError):
+            call_command('generate_data', str(tmp_path / 'one'), *options, stdout=io.StringIO())
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_load_data_large_batch(self, tmp_path):
+        from reviews.models import Genre
+
+        path = tmp_path / 'genre.csv'
+        path.write_text(
+            'id,name,slug\n' + ''.join(f'{i},Жанр {i},genre-{i}\n' for i in range(1, 601)),
+            encoding='utf-8'
+        )
+        call_command('load_data', '--table', f'genre={path}', stdout=io.StringIO())
+        assert Genre.objects.count() == 600, (
+            'Проверьте, что пачка по умолчанию больше 500 строк загружается в SQLite'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_load_data_spawn(self, monkeypatch):
+        import multiprocessing
+
+        from reviews.management.commands import load_data
+        from reviews.models import Title
+
+        get_context = multiprocessing.get_context
+        requested = []
+
+        def spawn_by_default(method=None):
+            requested.append(method)
+            return get_context(method or 'spawn')
+
+        monkeypatch.setattr(load_data.multiprocessing, 'get_context', spawn_by_default)
+        call_command('load_data', '--workers', '2', stdout=io.StringIO())
+        assert Title.objects.count() == 32
+        assert requested and None not in requested, (
+            'Проверьте, что разборщики запускаются через fork, а не через '
+            'метод запуска по умолчанию'
+        )
+        monkeypatch.setattr(
+            load_data.multiprocessing, 'get_all_start_methods', lambda: ['spawn']
+        )
+        requested.clear()
+        call_command('flush', '--no-input')
+        call_command('load_data', '--workers', '2', stdout=io.StringIO())
+        assert Title.objects.count() == 32 and not requested, (
+            'Проверьте, что без fork таблицы разбираются на месте'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_fast_requires_sqlite(self, monkeypatch):
+        from django.db import connection
+
+        monkeypatch.setattr(connection, 'vendor', 'postgresql')
+        for args in (('load_data', '--fast'), ('benchmark_load_data',)):
+            with pytest.raises(CommandError) as error:
+                call_command(*args, stdout=io.StringIO())
+            command = args[0]
+            assert 'SQLite' in str(error.value) and 'postgresql' in str(error.value), (
+                f'Проверьте, что `{command}` сообщает, что режиму --fast нужна SQLite'
+            )
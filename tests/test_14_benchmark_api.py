@@ -0,0 +1,85 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+
+class Test14BenchmarkApi:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_benchmark_api_measure(self, tmp_path):
+        from reviews.management.commands.benchmark_api import Command
+
+        call_command('generate_data', str(tmp_path), '--titles', '20', '--seed', '3',
+                     stdout=io.StringIO())
+        call_command('load_data', '--path', str(tmp_path), '--workers', '0',
+                     stdout=io.StringIO())
+        out = io.StringIO()
+        routes, calibration = Command(stdout=out).measure_routes({
+            'routes': 'titles-*,reviews-list,users-me,auth-*',
+            'requests': 3,
+            'warmup': 0,
+            'cold': True,
+        })
+        assert set(routes) >= {
+            'titles-list', 'titles-detail', 'reviews-list', 'users-me',
+            'auth-signup', 'auth-token'
+        }, (
+            'Проверьте, что `benchmark_api` замеряет выбранные маршруты'
+        )
+        assert 'genres-list' not in routes
+        detail = routes['titles-detail']
+        assert len(detail['samples']) == len(calibration['samples']) == 3
+        assert detail['p50'] <= detail['p95'] <= detail['p99'], (
+            'Проверьте, что `benchmark_api` считает перцентили задержки'
+        )
+        assert detail['queries'] > 0 and detail['size'] > 0, (
+            'Проверьте, что `benchmark_api` записывает число запросов и размер ответа'
+        )
+        assert 'titles-detail' in out.getvalue()
+        urls = {route.name: route.url for route in Command().get_routes()}
+        assert urls['titles-list-last-page'] == '/api/v1/titles/?offset=10', (
+            'Проверьте, что последняя страница произведений запрашивается через `offset`'
+        )
+
+    def test_02_benchmark_api_compare(self, tmp_path):
+        samples = [1.0 + index / 100 for index in range(40)]
+        route = {'samples': samples, 'p50': 1.2, 'queries': 3}
+        base = {
+            'version': 1,
+            'calibration': {'p50': 1.0},
+            'routes': {'titles-list': route, 'genres-list': route},
+        }
+        slower = dict(route, samples=[value * 1.5 for value in samples], p50=1.8)
+        new = dict(base, routes={
+            'titles-list': slower, 'genres-list': dict(route, queries=4)
+        })
+        (tmp_path / 'base.json').write_text(json.dumps(base), encoding='utf-8')
+        (tmp_path / 'new.json').write_text(json.dumps(new), encoding='utf-8')
+        out = io.StringIO()
+        call_command(
+            'benchmark_api', '--compare', str(tmp_path / 'base.json'),
+            str(tmp_path / 'base.json'), stdout=out
+        )
+        assert 'Регрессий не найдено' in out.getvalue()
+        out = io.StringIO()
+        with pytest.raises(CommandError, match='Регрессий: 2'):
+            call_command(
+                'benchmark_api', '--compare', str(tmp_path / 'base.json'),
+                str(tmp_path / 'new.json'), stdout=out
+            )
+        lines = dict(line.split(maxsplit=1) for line in out.getvalue().splitlines()[1:])
+        assert lines['titles-list'].endswith('latency'), (
+            'Проверьте, что сравнение находит значимый рост задержки'
+        )
+        assert lines['genres-list'].endswith('queries'), (
+            'Проверьте, что сравнение находит рост числа SQL-запросов'
+        )
+        new['calibration'] = {'p50': 1.5}
+        (tmp_path / 'new.json').write_text(json.dumps(new), encoding='utf-8')
+        with pytest.raises(CommandError, match='Регрессий: 1'):
+            call_command(
+                'benchmark_api', '--compare', str(tmp_path / 'base.json'),
+                str(tmp_path / 'new.json'), stdout=io.StringIO()
+            )
@@ -0,0 +1,101 @@
+import pytest
+
+from .common import bulk_create_reviews, bulk_create_titles
+
+
+class Test15NPlusOne:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_detect_queries(self):
+        from api_yamdb.nplusone import NPlusOneError, detect_queries
+        from reviews.models import Review
+
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, 5)
+        with detect_queries(raise_errors=False) as detector:
+            authors = [review.author.username for review in Review.objects.all()]
+        assert len(authors) == 5
+        findings = detector.findings(2)
+        assert len(findings) == 1 and findings[0].count == 5, (
+            'Проверьте, что детектор группирует однотипные запросы'
+        )
+        origin, = findings[0].origins
+        assert 'test_15_nplusone.py' in origin, (
+            'Проверьте, что детектор указывает строку кода, откуда пришли запросы'
+        )
+        with pytest.raises(NPlusOneError):
+            with detect_queries(threshold=2, raise_errors=True):
+                [review.author_id for review in Review.objects.all()]
+                [review.author.username for review in Review.objects.all()]
+        with detect_queries(threshold=2, raise_errors=True):
+            [review.author.username for review in Review.objects.select_related('author')]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_origin_serializer_and_permission(self, user):
+        from api.v1.permissions import IsAdminModerAuthor
+        from api_yamdb.nplusone import detect_queries
+        from rest_framework import serializers
+        from reviews.models import Review
+
+        class ReviewAuthorSerializer(serializers.ModelSerializer):
+            author = serializers.StringRelatedField()
+
+            class Meta:
+                model = Review
+                fields = ('id', 'author')
+
+        class Request:
+            method = 'PATCH'
+
+        Request.user = user
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, 4)
+        with detect_queries(raise_errors=False) as detector:
+            ReviewAuthorSerializer(Review.objects.all(), many=True).data
+        origin, = detector.findings(2)[0].origins
+        assert origin.startswith('ReviewAuthorSerializer.author'), (
+            'Проверьте, что детектор называет поле сериализатора, '
+            f'которое делает запросы. Сейчас {origin}'
+        )
+        permission = IsAdminModerAuthor()
+        with detect_queries(raise_errors=False) as detector:
+            for review in Review.objects.all():
+                permission.has_object_permission(Request, None, review)
+        origin, = detector.findings(2)[0].origins
+        assert origin.startswith('IsAdminModerAuthor.has_object_permission'), (
+            'Проверьте, что детектор называет разрешение, которое делает '
+            f'запросы. Сейчас {origin}'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_middleware(self, client, monkeypatch):
+        from api.v1.views import ReviewViewSet
+        from api_yamdb.nplusone import NPlusOneError
+        from reviews.models import Review
+
+        title = bulk_create_titles(1)[0]
+        bulk_create_reviews(title, 4)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        assert client.get(url).status_code == 200
+        monkeypatch.setattr(ReviewViewSet, 'values_serializer_class', None)
+        monkeypatch.setattr(
+            ReviewViewSet, 'get_queryset',
+            lambda view: Review.objects.filter(title_id=view.kwargs['title_id'])
+        )
+        with pytest.raises(NPlusOneError, match='ReviewSerializer.author'):
+            client.get(f'{url}?fields=id,author')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_admin_changelists(self, client, django_user_model):
+        superuser = django_user_model.objects.create_superuser(
+            'root', 'root@yamdb.fake', 'password'
+        )
+        client.force_login(superuser)
+        title = bulk_create_titles(3)[0]
+        bulk_create_reviews(title, 4)
+        for model in ('title', 'genretitle', 'review'):
+            response = client.get(f'/admin/reviews/{model}/')
+            assert response.status_code == 200, (
+                f'Проверьте, что список `{model}` в админке открывается '
+                'без однотипных запросов к связанным объектам'
+            )
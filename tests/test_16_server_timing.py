@@ -0,0 +1,70 @@
+import pytest
+
+from .common import bulk_create_reviews, bulk_create_titles
+
+
+def parse_server_timing(value):
+    result = {}
+    for item in value.split(','):
+        name, *params = item.strip().split(';')
+        result[name] = dict(param.split('=', 1) for param in params)
+    return result
+
+
+class Test16ServerTiming:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_server_timing(self, client, settings):
+        title = bulk_create_titles(3)[0]
+        bulk_create_reviews(title, 3)
+        response = client.get('/api/v1/titles/')
+        assert 'Server-Timing' not in response, (
+            'Проверьте, что без настройки `SERVER_TIMING` заголовок не отдаётся'
+        )
+        settings.SERVER_TIMING = True
+        response = client.get('/api/v1/titles/?genre=drama')
+        assert response.status_code == 200
+        timings = parse_server_timing(response['Server-Timing'])
+        for phase in ('auth', 'permissions', 'filter', 'query', 'serialize',
+                      'render', 'db', 'total'):
+            assert phase in timings, (
+                f'Проверьте, что Server-Timing содержит фазу `{phase}`'
+            )
+        assert timings['db']['desc'] != '"0 SQL"'
+        total = float(timings['total']['dur'])
+        phases = sum(
+            float(params['dur']) for name, params in timings.items()
+            if name not in ('db', 'total')
+        )
+        assert phases <= total, (
+            'Проверьте, что вложенные фазы не учитываются дважды'
+        )
+        response = client.get(f'/api/v1/titles/{title.id}/reviews/')
+        assert 'cache' in parse_server_timing(response['Server-Timing'])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_server_timing_admin_header(self, admin_client, user_client):
+        from api_yamdb.timing import request_timed
+
+        records = []
+
+        def receiver(request, record, **kwargs):
+            records.append(record.as_dict())
+
+        request_timed.connect(receiver)
+        try:
+            response = user_client.get('/api/v1/users/me/', HTTP_X_SERVER_TIMING='1')
+            assert 'Server-Timing' not in response, (
+                'Проверьте, что Server-Timing по заголовку запроса получает '
+                'только администратор'
+            )
+            response = admin_client.get('/api/v1/users/', HTTP_X_SERVER_TIMING='1')
+            assert 'auth' in parse_server_timing(response['Server-Timing'])
+            admin_client.get('/api/v1/users/')
+        finally:
+            request_timed.disconnect(receiver)
+        assert len(records) == 2, (
+            'Проверьте, что замеры запросов доступны через сигнал `request_timed`'
+        )
+        assert records[1]['sql']['count'] > 0
+        assert set(records[1]['phases']) >= {'auth', 'permissions', 'query'}
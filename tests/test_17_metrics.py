@@ -0,0 +1,118 @@
+import multiprocessing
+import re
+
+import pytest
+
+from .common import bulk_create_titles
+
+
+def sample(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    match = re.search(rf'^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$', text, re.M)
+    assert match, f'Проверьте, что `/metrics` содержит {name}{{{label_text}}}'
+    return float(match.group(1))
+
+
+def increment_in_child(directory):
+    from django.conf import settings
+    from api_yamdb.metrics import REQUESTS
+
+    settings.METRICS_DIR = directory
+    for _ in range(3):
+        REQUESTS.inc(route='api:titles-list', method='GET', status='200')
+
+
+class Test17Metrics:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_metrics(self, client, admin_client):
+        title = bulk_create_titles(2)[0]
+        client.get('/api/v1/titles/')
+        client.get('/api/v1/titles/')
+        client.get(f'/api/v1/titles/{title.id}/')
+        client.get('/api/v1/titles/100500/')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.content.decode()
+        assert sample(
+            text, 'api_requests_total', route='api:titles-list', method='GET', status='200'
+        ) == 2, (
+            'Проверьте, что запросы считаются по имени маршрута, а не по адресу'
+        )
+        assert sample(
+            text, 'api_requests_total', route='api:titles-detail', method='GET', status='404'
+        ) == 1
+        assert sample(
+            text, 'api_request_duration_seconds_count', route='api:titles-list', method='GET'
+        ) == 2
+        assert sample(
+            text, 'api_request_duration_seconds_bucket', route='api:titles-list', method='GET',
+            le='+Inf'
+        ) == 2
+        assert sample(text, 'api_request_queries_count', route='api:titles-list') == 2
+        assert sample(text, 'api_request_queries_sum', route='api:titles-list') > 0, (
+            'Проверьте, что `/metrics` учитывает SQL-запросы'
+        )
+        assert sample(text, 'api_response_bytes_sum', route='api:titles-detail') > 0
+        assert sample(text, 'api_cache_operations_total', cache='response', result='hit') >= 1, (
+            'Проверьте, что `/metrics` содержит попадания и промахи кешей'
+        )
+        buckets = re.findall(
+            r'^api_request_queries_bucket\{le="([^"]+)",route="api:titles-list"\} (\S+)$',
+            text, re.M
+        )
+        assert [float(value) for _, value in buckets] == sorted(
+            float(value) for _, value in buckets
+        ), 'Проверьте, что корзины гистограммы кумулятивные'
+        assert buckets[-1] == ('+Inf', '2.0')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_metrics_processes(self, client, metrics_dir):
+        from api_yamdb.metrics import REQUESTS
+
+        REQUESTS.inc(route='api:titles-list', method='GET', status='200')
+        process = multiprocessing.get_context('fork').Process(
+            target=increment_in_child, args=(metrics_dir,)
+        )
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        text = client.get('/metrics').content.decode()
+        assert sample(
+            text, 'api_requests_total', route='api:titles-list', method='GET', status='200'
+        ) == 4, (
+            'Проверьте, что `/metrics` суммирует счётчики всех процессов'
+        )
+
+    def test_03_metrics_file_growth(self, tmp_path):
+        from api_yamdb.metrics import MetricsFile, collect
+
+        metrics_file = MetricsFile(str(tmp_path / '1.db'))
+        for index in range(5000):
+            metrics_file.add(f'["metric_{index}", {{}}]', index)
+        metrics_file.add('["metric_7", {}]', 1)
+        reopened = MetricsFile(str(tmp_path / '1.db'))
+        reopened.add('["metric_8", {}]', 1)
+        values = collect(str(tmp_path))
+        assert len(values) == 5000
+        assert values['["metric_7", {}]'] == 8
+        assert values['["metric_8", {}]'] == 9
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_metrics_dir_unwritable(self, client, settings, tmp_path, caplog):
+        (tmp_path / 'file').write_text('')
+        settings.METRICS_DIR = str(tmp_path / 'file' / 'metrics')
+        for _ in range(2):
+            response = client.get('/api/v1/genres/')
+            assert response.status_code == 200, (
+                'Проверьте, что ошибка записи метрик не ломает запросы к API'
+            )
+        failures = [record for record in caplog.records if record.name == 'api_yamdb.metrics']
+        assert len(failures) == 1, (
+            'Проверьте, что ошибка записи метрик пишется в лог один раз'
+        )
+        settings.METRICS_DIR = str(tmp_path / 'metrics')
+        client.get('/api/v1/genres/')
+        assert client.get('/metrics').status_code == 200
+        assert 'route="api:genres-list"' in client.get('/metrics').content.decode()
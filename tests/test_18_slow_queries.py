@@ -0,0 +1,114 @@
+import io
+import json
+import os
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from .common import bulk_create_reviews, bulk_create_titles
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+class Test18SlowQueries:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_slow_query_log(self, client, settings, slow_query_log):
+        title = bulk_create_titles(3)[0]
+        bulk_create_reviews(title, 3)
+        client.get(f'/api/v1/titles/{title.id}/')
+        assert not os.path.exists(slow_query_log), (
+            'Проверьте, что быстрые запросы не попадают в журнал'
+        )
+        settings.SLOW_QUERY_MS = 0
+        client.get(f'/api/v1/titles/{title.id}/reviews/')
+        records = read_log(slow_query_log)
+        assert records, (
+            'Проверьте, что запросы дольше `SLOW_QUERY_MS` пишутся в журнал'
+        )
+        record = next(
+            record for record in records if 'reviews_review' in record['sql']
+        )
+        assert record['route'] == 'api:reviews-list', (
+            'Проверьте, что в журнале указан маршрут запроса'
+        )
+        assert record['params'] and record['duration_ms'] >= 0
+        assert '?' in record['fingerprint'] or '%s' in record['fingerprint']
+        assert record['plan'] and any(
+            'reviews_review' in line for line in record['plan']
+        ), (
+            'Проверьте, что для медленных запросов сохраняется EXPLAIN QUERY PLAN'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_slow_query_log_rotation(self, client, settings, slow_query_log):
+        title = bulk_create_titles(1)[0]
+        review = bulk_create_reviews(title, 2)
+        settings.SLOW_QUERY_MS = 0
+        settings.SLOW_QUERY_LOG_MAX_BYTES = 2000
+        settings.SLOW_QUERY_LOG_BACKUPS = 2
+        for _ in range(10):
+            client.get(f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/')
+        assert os.path.exists(f'{slow_query_log}.1'), (
+            'Проверьте, что журнал медленных запросов ротируется'
+        )
+        assert not os.path.exists(f'{slow_query_log}.3')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_slow_queries_command(self, client, settings):
+        with pytest.raises(CommandError):
+            call_command('slow_queries', stdout=io.StringIO())
+        title = bulk_create_titles(1)[0]
+        review = bulk_create_reviews(title, 2)
+        settings.SLOW_QUERY_MS = 0
+        for _ in range(3):
+            client.get(f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/')
+        out = io.StringIO()
+        call_command('slow_queries', '--top', '2', '--order', 'count', stdout=out)
+        output = out.getvalue()
+        assert 'api:comments-list ×3' in output, (
+            'Проверьте, что сводка группирует запросы по отпечатку и маршруту'
+        )
+        assert output.count('SQL: ') == 2
+        assert 'план: ' in output
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_slow_query_log_unwritable(self, client, settings, tmp_path, caplog):
+        (tmp_path / 'file').write_text('')
+        settings.SLOW_QUERY_LOG = str(tmp_path / 'file' / 'logs' / 'slow.jsonl')
+        settings.SLOW_QUERY_MS = 0
+        for _ in range(2):
+            response = client.get('/api/v1/categories/')
+            assert response.status_code == 200, (
+                'Проверьте, что ошибка записи журнала медленных запросов '
+                'не ломает запросы к API'
+            )
+        failures = [record for record in caplog.records if record.name == 'api_yamdb.slowlog']
+        assert len(failures) == 1, (
+            'Проверьте, что ошибка журнала медленных запросов пишется в лог один раз'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_slow_query_log_per_process(self, client, settings, slow_query_log):
+        settings.SLOW_QUERY_MS = 0
+        client.get('/api/v1/categories/')
+        assert str(os.getpid()) in os.path.basename(slow_query_log)
+        assert read_log(slow_query_log), (
+            'Проверьте, что каждый процесс пишет свой файл журнала с pid в имени'
+        )
+        from api_yamdb.slowlog import process_log_path
+
+        other = process_log_path(settings.SLOW_QUERY_LOG, 1)
+        with open(other, 'w', encoding='utf-8') as log_file:
+            log_file.write(json.dumps({
+                'fingerprint': 'SELECT 1', 'duration_ms': 5000.0,
+                'route': 'api:other', 'params': None, 'plan': None,
+            }) + '\n')
+        out = io.StringIO()
+        call_command('slow_queries', stdout=out)
+        assert 'api:other ×1' in out.getvalue(), (
+            'Проверьте, что сводка читает журналы всех процессов'
+        )